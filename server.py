@@ -1,23 +1,34 @@
+import atexit
 import os
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import (Flask, request, jsonify, send_from_directory, redirect,
-                   url_for, render_template)
+from flask import (Flask, request, jsonify, send_file, send_from_directory, redirect,
+                   url_for, render_template, g, has_request_context, stream_with_context)
+from flask.logging import default_handler
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_cors import CORS
+import bisect
 import datetime
+import gzip
+import hashlib
+import io
+import json
+import math
+import re
 import shutil
+import tempfile
 import logging
-from logging.handlers import TimedRotatingFileHandler
-from functools import wraps
-import pandas as pd
-import subprocess
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from abc import ABC, abstractmethod
 import csv
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+# numpy, smtplib and the email MIME modules are imported where they are used: most requests
+# never touch them, and every gunicorn worker would otherwise pay for them at boot. Workout CSVs
+# are parsed with the csv module; they are a few dozen rows, too small to be worth pandas.
 
 app = Flask(__name__, template_folder='web')
 app.secret_key = b'a_much_more_secure_secret_key_please_change'
@@ -25,26 +36,142 @@ CORS(app)
 
 # --- DIRECTORY AND DATABASE PATHS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'api', 'users.db')
+# Workout files, users.db and the archive; DUNAMIS_DATA_DIR points a server at another copy (e.g. tools/ data).
+DATA_DIR = os.environ.get('DUNAMIS_DATA_DIR', BASE_DIR)
+DB_PATH = os.path.join(DATA_DIR, 'api', 'users.db')
 WEB_DIR = os.path.join(BASE_DIR, 'web')
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
-PLANNED_DIR = os.path.join(BASE_DIR, 'planned_workouts')
-INPROGRESS_DIR = os.path.join(BASE_DIR, 'inprogress_workouts')
-FINISHED_DIR = os.path.join(BASE_DIR, 'finished_workouts')
-API_DIR = os.path.join(BASE_DIR, 'api')
+PLANNED_DIR = os.path.join(DATA_DIR, 'planned_workouts')
+INPROGRESS_DIR = os.path.join(DATA_DIR, 'inprogress_workouts')
+FINISHED_DIR = os.path.join(DATA_DIR, 'finished_workouts')
+API_DIR = os.path.join(DATA_DIR, 'api')
 EMAILS_PATH = os.path.join(API_DIR, 'emails.csv')
+EXERCISES_PATH = os.path.join(API_DIR, 'exercises.csv')
+EXERCISES_LOCK_PATH = os.path.join(API_DIR, 'exercises.lock')
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'workout_archive')
 
 # --- LOGGING SETUP ---
-log_formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-log_file = os.path.join(BASE_DIR, 'dunamis_app.log')
-handler = TimedRotatingFileHandler(log_file, when='midnight', interval=1, backupCount=7)
-handler.setFormatter(log_formatter)
-handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
+# Request threads only put records on a queue; one listener thread per worker writes them to
+# dunamis_app.log as JSON lines. The gunicorn workers share that file, so rotation at midnight
+# is done under an flock by the first worker to log after midnight, and the others reopen.
+LOG_FILE = os.path.join(BASE_DIR, 'dunamis_app.log')
+LOG_BACKUP_DAYS = 7
+# Hot-path records tagged with extra={'rate_limit': key} are written at most once per window.
+LOG_RATE_LIMIT_WINDOW = 60
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'pid': record.process,
+            'message': record.getMessage(),
+            'location': f'{record.module}:{record.lineno}',
+        }
+        for key in ('method', 'path', 'suppressed'):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        return json.dumps(entry)
+
+class RequestContextFilter(logging.Filter):
+    """Adds the request method and path while the record is still on the request thread."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.method, record.path = request.method, request.path
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Passes one record per rate_limit key each window and counts the ones it drops."""
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def filter(self, record):
+        key = getattr(record, 'rate_limit', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._seen.get(key, (None, 0))
+            if last is not None and now - last < self.window:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class SharedDailyLogHandler(logging.Handler):
+    """Appends to a log file shared by several processes, rotating it to <name>.YYYY-MM-DD daily.
+
+    A file last written before today is renamed under an flock, so exactly one process rotates it;
+    every process reopens the path on its first record after midnight.
+    """
+
+    def __init__(self, path, backup_days):
+        super().__init__()
+        self.path, self.backup_days = path, backup_days
+        self._stream = None
+        self._rollover_at = 0
+
+    def _rollover(self):
+        import fcntl
+        with open(f'{self.path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                last_written = datetime.date.fromtimestamp(os.stat(self.path).st_mtime)
+            except FileNotFoundError:
+                last_written = None
+            if last_written and last_written < datetime.date.today():
+                os.replace(self.path, f'{self.path}.{last_written.isoformat()}')
+                directory, name = os.path.split(self.path)
+                backups = sorted(f for f in os.listdir(directory) if re.fullmatch(re.escape(name) + r'\.\d{4}-\d{2}-\d{2}', f))
+                for old in backups[:-self.backup_days]:
+                    os.remove(os.path.join(directory, old))
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = open(self.path, 'a', encoding='utf-8')
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        self._rollover_at = datetime.datetime.combine(tomorrow, datetime.time()).timestamp()
+
+    def emit(self, record):
+        try:
+            if self._stream is None or time.time() >= self._rollover_at:
+                self._rollover()
+            self._stream.write(self.format(record) + '\n')
+            self._stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        super().close()
+
+log_queue = queue.SimpleQueue()
+file_handler = SharedDailyLogHandler(LOG_FILE, LOG_BACKUP_DAYS)
+file_handler.setFormatter(JsonLogFormatter())
+# Warnings and errors still reach stderr, which start.sh collects in workoutapp.log.
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.WARNING)
+console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+queue_handler = QueueHandler(log_queue)
+queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT_WINDOW))
+queue_handler.addFilter(RequestContextFilter())
+app.logger.removeHandler(default_handler)
+app.logger.addHandler(queue_handler)
 app.logger.setLevel(logging.INFO)
+log_listener.start()
+atexit.register(log_listener.stop)
 app.logger.info('Dunamis App starting up...')
 
-for directory in [WEB_DIR, PLANNED_DIR, INPROGRESS_DIR, FINISHED_DIR, API_DIR, ASSETS_DIR]:
+for directory in [WEB_DIR, PLANNED_DIR, INPROGRESS_DIR, FINISHED_DIR, API_DIR, ASSETS_DIR, ARCHIVE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 # --- LOGIN MANAGER SETUP ---
@@ -61,21 +188,53 @@ class User(UserMixin):
 @login_manager.user_loader
 def load_user(user_id):
     if user_id is not None and int(user_id) == 1:
-        app.logger.info(f"load_user: Successfully loaded coach user (ID: {user_id}) from session.")
+        app.logger.info(f"load_user: Successfully loaded coach user (ID: {user_id}) from session.", extra={'rate_limit': 'load_user'})
         return User(id=1, username='coach', role='coach')
-    app.logger.warning(f"load_user: Attempted to load an invalid user_id from session: {user_id}")
+    app.logger.warning(f"load_user: Attempted to load an invalid user_id from session: {user_id}", extra={'rate_limit': 'load_user_invalid'})
     return None
 
 @login_manager.unauthorized_handler
 def unauthorized_callback():
-    app.logger.warning(f"Unauthorized access attempt to path: {request.path}")
+    app.logger.warning(f"Unauthorized access attempt to path: {request.path}", extra={'rate_limit': 'unauthorized'})
     if request.path.startswith('/api/'):
         return jsonify(status='error', message='Authentication required'), 401
     return redirect(url_for('login'))
 
+def read_roster_csv(path):
+    """Parses an Athlete,Email csv (the legacy api/emails.csv format) into [(name, email), ...]."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(row['Athlete'].strip(), (row.get('Email') or '').strip())
+                for row in csv.DictReader(f) if row.get('Athlete') and row['Athlete'].strip()]
+
+def apply_roster(conn, athletes):
+    """Makes the athletes table match [(name, email), ...], touching only rows that changed."""
+    wanted = {}
+    for name, email in athletes:
+        wanted[name.lower()] = (name, email)
+    existing = {row[0].lower(): row for row in conn.execute("SELECT name, email FROM athletes")}
+    removed = [existing[key][0] for key in existing.keys() - wanted.keys()]
+    changed = [wanted[key] for key in wanted if existing.get(key) is None or tuple(existing[key]) != wanted[key]]
+    conn.executemany("DELETE FROM athletes WHERE name = ?", [(name,) for name in removed])
+    conn.executemany('''
+        INSERT INTO athletes (name, email) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET name = excluded.name, email = excluded.email
+    ''', changed)
+    if changed or removed:
+        conn.execute("UPDATE roster_version SET version = version + 1")
+    return len(changed), len(removed)
+
+# Bump whenever init_db gains a table or index so existing databases pick it up.
+SCHEMA_VERSION = 9
+
 def init_db():
+    """Creates the schema and seeds the coach account once per SCHEMA_VERSION, not on every worker boot."""
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
+        user_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if user_version >= SCHEMA_VERSION:
+            return
+        # WAL lets the workers keep reading while one of them writes; the setting persists in the file.
+        cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -88,11 +247,340 @@ def init_db():
         if cursor.fetchone() is None:
             hashed_password = generate_password_hash('get$trong@dunamis')
             cursor.execute(
-                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                "INSERT OR IGNORE INTO users (username, password_hash, role) VALUES (?, ?, ?)",
                 ('coach', hashed_password, 'coach')
             )
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_files (
+                athlete TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (athlete, filename)
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_aggregates (
+                athlete TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                exercise TEXT NOT NULL,
+                date TEXT NOT NULL,
+                max_weight REAL NOT NULL,
+                total_volume REAL NOT NULL,
+                PRIMARY KEY (athlete, filename, exercise, date)
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                attachment_name TEXT,
+                attachment BLOB,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                sent_at REAL,
+                last_error TEXT
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS progress_sessions (
+                filename TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS progress_journal (
+                filename TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                changes TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (filename, version)
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS athletes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                email TEXT NOT NULL
+            );
+        ''')
+        # One row counting roster changes, so the per-worker roster cache ignores every other write to users.db.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS roster_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            );
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO roster_version (id, version) VALUES (1, 0)")
+        # The roster used to live in api/emails.csv; import it the first time the table is created.
+        if cursor.execute("SELECT COUNT(*) FROM athletes").fetchone()[0] == 0 and os.path.exists(EMAILS_PATH):
+            apply_roster(conn, read_roster_csv(EMAILS_PATH))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS request_metrics (
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (name, labels)
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS session_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                athlete TEXT NOT NULL COLLATE NOCASE,
+                filename TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                version INTEGER,
+                sets TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_events_created ON session_events (created_at)")
+        # Notes from in-progress and finished workouts, one row per file, exercise, author and text.
+        # notes_files records which files are indexed and their (mtime_ns, size) when read; a search
+        # indexes any that storage has and it lacks, or holds with a different signature.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notes_files (
+                filename TEXT PRIMARY KEY,
+                athlete TEXT NOT NULL COLLATE NOCASE,
+                state TEXT NOT NULL,
+                mtime_ns INTEGER,
+                size INTEGER
+            );
+        ''')
+        if 0 < user_version < 8:
+            # Rows indexed before signatures were kept have none, so the next search re-reads them.
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(notes_files)")}
+            for column in ('mtime_ns', 'size'):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE notes_files ADD COLUMN {column} INTEGER")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS workout_notes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                athlete TEXT NOT NULL COLLATE NOCASE,
+                exercise TEXT NOT NULL COLLATE NOCASE,
+                date TEXT,
+                source TEXT NOT NULL,
+                note TEXT NOT NULL
+            );
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_files_athlete ON notes_files (athlete)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_workout_notes_file ON workout_notes (filename)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_workout_notes_athlete ON workout_notes (athlete, date)")
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                    note, content='workout_notes', content_rowid='id', tokenize='porter unicode61'
+                );
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS workout_notes_ai AFTER INSERT ON workout_notes BEGIN
+                    INSERT INTO notes_fts (rowid, note) VALUES (new.id, new.note);
+                END;
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS workout_notes_ad AFTER DELETE ON workout_notes BEGIN
+                    INSERT INTO notes_fts (notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+                END;
+            ''')
+        except sqlite3.OperationalError as e:
+            app.logger.warning(f"SQLite has no FTS5 ({e}); note search will scan workout_notes instead.")
+        if 0 < user_version < 4:
+            # Set rows now live in the workout archive, which the next sync rebuilds from the CSVs.
+            cursor.execute("DROP TABLE IF EXISTS workout_sets")
+            cursor.execute("DROP TABLE IF EXISTS exercise_sessions")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 init_db()
 
+@contextmanager
+def immediate_transaction():
+    """Yields a users.db connection holding the write lock until commit, for cross-worker read-modify-write."""
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+# --- REQUEST METRICS ---
+# Each worker accumulates counters in memory and a background thread adds them to the
+# request_metrics table every few seconds, so /api/metrics can report totals for all gunicorn
+# workers at once. Histogram buckets are stored cumulatively, as Prometheus exposes them.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_FLUSH_INTERVAL = 10
+METRIC_DEFINITIONS = {
+    'dunamis_http_requests_total': ('counter', 'Requests handled, by route, method and status.'),
+    'dunamis_http_request_duration_seconds': ('histogram', 'Time spent handling a request, by route.'),
+    'dunamis_http_request_bytes_total': ('counter', 'Request body bytes received, by route.'),
+    'dunamis_http_response_bytes_total': ('counter', 'Response body bytes sent, by route.'),
+    'dunamis_io_operations_total': ('counter', 'Directory listings, CSV parses, file and storage database reads/writes and archive reads/writes, by route.'),
+    'dunamis_smtp_seconds_total': ('counter', 'Time spent connecting to and sending through the SMTP server.'),
+    'dunamis_emails_total': ('counter', 'Outbox emails handed to the SMTP server, by result.'),
+}
+
+def _metric_labels(labels):
+    escaped = {k: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for k, v in labels.items()}
+    return ','.join(f'{k}="{escaped[k]}"' for k in sorted(escaped))
+
+def _metric_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class MetricsRecorder:
+    """Per-worker metric deltas, periodically added to users.db by a daemon thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def add(self, name, value=1, **labels):
+        key = (name, _metric_labels(labels))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        for bound in METRICS_LATENCY_BUCKETS:
+            if seconds <= bound:
+                self.add(f'{name}_bucket', le=bound, **labels)
+        self.add(f'{name}_bucket', le='+Inf', **labels)
+        self.add(f'{name}_sum', seconds, **labels)
+        self.add(f'{name}_count', **labels)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with sqlite3.connect(DB_PATH, timeout=5) as conn:
+                conn.executemany('''
+                    INSERT INTO request_metrics (name, labels, value) VALUES (?, ?, ?)
+                    ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value
+                ''', [(name, labels, value) for (name, labels), value in pending.items()])
+        except sqlite3.Error as e:
+            app.logger.warning(f"Could not flush request metrics, keeping them for the next attempt: {e}")
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+
+    def render(self):
+        """All workers' totals in the Prometheus text exposition format."""
+        self.flush()
+        with sqlite3.connect(DB_PATH) as conn:
+            rows = conn.execute("SELECT name, labels, value FROM request_metrics ORDER BY name, labels").fetchall()
+        lines = []
+        for base, (kind, description) in METRIC_DEFINITIONS.items():
+            lines += [f'# HELP {base} {description}', f'# TYPE {base} {kind}']
+            names = (f'{base}_bucket', f'{base}_sum', f'{base}_count') if kind == 'histogram' else (base,)
+            lines += [f'{name}{{{labels}}} {_metric_value(value)}' if labels else f'{name} {_metric_value(value)}'
+                      for name, labels, value in rows if name in names]
+        return '\n'.join(lines) + '\n'
+
+    def flush_at_exit(self):
+        """The worker's last flush; skipped when the data directory has already been removed."""
+        if os.path.exists(DB_PATH):
+            self.flush()
+
+metrics = MetricsRecorder()
+atexit.register(metrics.flush_at_exit)
+
+def _metrics_route():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+    return 'background'
+
+def count_io(kind, count=1):
+    """Counts a filesystem operation against the route being served (or 'background')."""
+    metrics.add('dunamis_io_operations_total', count, route=_metrics_route(), kind=kind)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.start()
+
+def _record_request(started, status, response_bytes):
+    route = _metrics_route()
+    metrics.add('dunamis_http_requests_total', route=route, method=request.method, status=status)
+    metrics.observe('dunamis_http_request_duration_seconds', time.perf_counter() - started, route=route)
+    metrics.add('dunamis_http_request_bytes_total', request.content_length or 0, route=route)
+    metrics.add('dunamis_http_response_bytes_total', response_bytes, route=route)
+
+# Registered before compress_response, so it runs after it and counts the bytes actually sent.
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        _record_request(started, response.status_code, response.content_length or 0)
+    return response
+
+# An exception that escapes the view and the after_request handlers (propagated in debug mode, or
+# raised by a later after_request handler) skips record_request_metrics; count it as a 500 here.
+@app.teardown_request
+def record_failed_request_metrics(exc):
+    started = g.pop('request_started', None)
+    if started is not None:
+        _record_request(started, 500, 0)
+
+# --- RESPONSE COMPRESSION ---
+# JSON compresses several-fold, which matters to phones on gym Wi-Fi. Brotli is used when the
+# optional brotli package is installed, gzip otherwise.
+COMPRESS_MIN_BYTES = 1024
+
+@lru_cache(maxsize=None)
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if _brotli() and request.accept_encodings['br']:
+        response.set_data(_brotli().compress(data, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The ETag described the uncompressed body; the encoded bytes only match it weakly.
+        response.set_etag(etag, weak=True)
+    return response
+
 # --- DECORATORS ---
 def coach_required(f):
     @wraps(f)
@@ -103,55 +591,1163 @@ def coach_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --- WORKOUT STORAGE ---
+# Plans, in-progress sessions, finished sessions and the exercise list live behind the
+# WorkoutStore interface; every workout is CSV text named by (state, filename). FileWorkoutStore
+# keeps the original layout of one CSV per workout in three directories plus api/exercises.csv.
+# SqliteWorkoutStore keeps the same text in api/workouts.db, where completing a session is one
+# transaction. DUNAMIS_STORAGE=sqlite selects it and tools/migrate_storage.py copies data between
+# the two. The roster lives in the athletes table of users.db with either backend.
+STORAGE_BACKEND = os.environ.get('DUNAMIS_STORAGE', 'files')
+STORAGE_DB_PATH = os.path.join(API_DIR, 'workouts.db')
+WORKOUT_SUFFIXES = {'planned': '.csv', 'inprogress': '_tracked.csv', 'finished': '_tracked.csv'}
+
+def get_workout_date(filename):
+    try: return datetime.datetime.strptime(filename.replace('_tracked.csv', '').replace('.csv', '').split('_')[-1], '%Y-%m-%d')
+    except ValueError: return None
+
+def _catalog_sort_key(entry):
+    date, filename = entry
+    return (date is None, date or datetime.datetime.min, filename)
+
+def exercises_csv(names):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['Exercise'])
+    writer.writerows([name] for name in names)
+    return out.getvalue()
+
+class WorkoutStore(ABC):
+    """Interface of a storage backend for workouts and the exercise list."""
+
+    @abstractmethod
+    def entries(self, state, athlete):
+        """Returns [(date, filename), ...] for the athlete, oldest first and undated files last."""
+
+    def files(self, state, athlete):
+        return [f for _, f in self.entries(state, athlete)]
+
+    @abstractmethod
+    def athletes(self, state):
+        """Lowercased names of every athlete with at least one workout in the given state."""
+
+    @abstractmethod
+    def read(self, state, filename):
+        """Returns the workout's CSV text; raises FileNotFoundError when there is none."""
+
+    def exists(self, state, filename):
+        return self.stat(state, filename) is not None
+
+    @abstractmethod
+    def stat(self, state, filename):
+        """(mtime_ns, size) of one workout, or None when there is none."""
+
+    @abstractmethod
+    def signatures(self, state, athlete):
+        """{filename: (mtime_ns, size)} for all of the athlete's workouts in the state."""
+
+    @abstractmethod
+    def write(self, state, filename, content):
+        """Writes one workout, replacing any of the same name."""
+
+    @abstractmethod
+    def write_many(self, state, files):
+        """Writes {filename: content} in one batch."""
+
+    @abstractmethod
+    def remove(self, state, filename):
+        """Deletes a workout; returns False when there was none."""
+
+    @abstractmethod
+    def complete(self, plan_filename, tracked_filename, content):
+        """Stores content as the finished workout and drops its plan and in-progress copy."""
+
+    @abstractmethod
+    def replace(self, files, exercises=None):
+        """Writes {(state, filename): content}, and the exercise list when given, all or nothing."""
+
+    @abstractmethod
+    def exercises_signature(self):
+        """A value that changes whenever the exercise list does, or None when there is no list."""
+
+    @abstractmethod
+    def exercises(self):
+        """The exercise list in its stored order."""
+
+    @abstractmethod
+    def save_exercises(self, names):
+        """Replaces the exercise list with names."""
+
+class FileWorkoutStore(WorkoutStore):
+    """The original file layout, with a per-worker index of filenames by state and athlete.
+
+    Each state's directory mtime is compared before use, so files written by another gunicorn
+    worker (or copied in by hand) cost one stat() to notice rather than a listdir() per request.
+    The mtime is taken before the listdir() and only trusted once it is MTIME_SETTLE_NS old, since
+    a file created in the same clock tick leaves it unchanged. Local writes mark the state for a
+    rescan rather than recording the new mtime, which may already cover another worker's file.
+
+    Every write goes to a temporary file that replaces the target, so a crash never leaves a
+    half-written CSV; moving a session between directories is still several steps, and a crash
+    between them leaves it in both.
+    """
+    STATES = {
+        'planned': (PLANNED_DIR, WORKOUT_SUFFIXES['planned']),
+        'inprogress': (INPROGRESS_DIR, WORKOUT_SUFFIXES['inprogress']),
+        'finished': (FINISHED_DIR, WORKOUT_SUFFIXES['finished']),
+    }
+
+    MTIME_SETTLE_NS = 2 * 10**9
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._mtimes = {}
+        self._entries = {}
+
+    def _path(self, state, filename):
+        if not filename or os.path.basename(filename) != filename or filename.startswith('.'):
+            raise FileNotFoundError(filename)
+        return os.path.join(self.STATES[state][0], filename)
+
+    def _dir_mtime(self, state):
+        return os.stat(self.STATES[state][0]).st_mtime_ns
+
+    def _scan(self, state):
+        directory, suffix = self.STATES[state]
+        mtime = self._dir_mtime(state)
+        by_athlete = {}
+        count_io('listdir')
+        for f in os.listdir(directory):
+            if f.endswith(suffix) and not f.startswith('.'):
+                by_athlete.setdefault(f.split('_')[0].lower(), []).append((get_workout_date(f), f))
+        for entries in by_athlete.values():
+            entries.sort(key=_catalog_sort_key)
+        self._entries[state] = by_athlete
+        self._mtimes[state] = mtime if time.time_ns() - mtime >= self.MTIME_SETTLE_NS else None
+
+    def _ensure_fresh(self, state):
+        mtime = self._mtimes.get(state)
+        if mtime is None or mtime != self._dir_mtime(state):
+            self._scan(state)
+
+    @staticmethod
+    def _write_file(path, content):
+        tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def entries(self, state, athlete):
+        with self._lock:
+            self._ensure_fresh(state)
+            return list(self._entries[state].get(athlete.lower(), []))
+
+    def athletes(self, state):
+        with self._lock:
+            self._ensure_fresh(state)
+            return sorted(athlete for athlete, entries in self._entries[state].items() if entries)
+
+    def read(self, state, filename):
+        count_io('file_read')
+        with open(self._path(state, filename), newline='', encoding='utf-8') as f:
+            return f.read()
+
+    def stat(self, state, filename):
+        try:
+            stat = os.stat(self._path(state, filename))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def signatures(self, state, athlete):
+        signatures = {}
+        for f in self.files(state, athlete):
+            signature = self.stat(state, f)
+            if signature is not None:
+                signatures[f] = signature
+        return signatures
+
+    def write(self, state, filename, content):
+        path = self._path(state, filename)
+        with self._lock:
+            self._write_file(path, content)
+            count_io('file_write')
+            self._mtimes.pop(state, None)
+
+    def write_many(self, state, files):
+        with self._lock:
+            try:
+                for filename, content in files.items():
+                    self._write_file(self._path(state, filename), content)
+            finally:
+                count_io('file_write', len(files))
+                self._mtimes.pop(state, None)
+
+    def remove(self, state, filename):
+        path = self._path(state, filename)
+        with self._lock:
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+            self._mtimes.pop(state, None)
+        return True
+
+    def complete(self, plan_filename, tracked_filename, content):
+        # Finished first: a crash part-way leaves a duplicate to clean up rather than a lost session.
+        self.write('finished', tracked_filename, content)
+        self.remove('inprogress', tracked_filename)
+        if plan_filename:
+            self.remove('planned', plan_filename)
+
+    def replace(self, files, exercises=None):
+        targets = [(self._path(state, filename), content) for (state, filename), content in files.items()]
+        if exercises is not None:
+            targets.append((EXERCISES_PATH, exercises_csv(exercises)))
+        done = []
+        with self._lock:
+            try:
+                for dest, content in targets:
+                    staged = f'{dest}.{os.getpid()}.import'
+                    with open(staged, 'w', newline='', encoding='utf-8') as f:
+                        f.write(content)
+                    backup = f'{dest}.{os.getpid()}.previous' if os.path.exists(dest) else None
+                    if backup:
+                        os.replace(dest, backup)
+                    done.append((dest, backup))
+                    os.replace(staged, dest)
+                    count_io('file_write')
+            except Exception:
+                for dest, backup in reversed(done):
+                    if backup:
+                        os.replace(backup, dest)
+                    elif os.path.exists(dest):
+                        os.remove(dest)
+                for dest, _ in targets:
+                    if os.path.exists(f'{dest}.{os.getpid()}.import'):
+                        os.remove(f'{dest}.{os.getpid()}.import')
+                raise
+            finally:
+                for state in {state for state, _ in files}:
+                    self._mtimes.pop(state, None)
+            for _, backup in done:
+                if backup:
+                    os.remove(backup)
+
+    def exercises_signature(self):
+        try:
+            stat = os.stat(EXERCISES_PATH)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def exercises(self):
+        count_io('csv_parse')
+        try:
+            with open(EXERCISES_PATH, newline='', encoding='utf-8') as f:
+                return [row['Exercise'] for row in csv.DictReader(f) if row.get('Exercise')]
+        except FileNotFoundError:
+            return []
+
+    def save_exercises(self, names):
+        self._write_file(EXERCISES_PATH, exercises_csv(names))
+        count_io('file_write')
+
+class SqliteWorkoutStore(WorkoutStore):
+    """Workouts and the exercise list in one WAL-mode SQLite file, indexed by state, athlete and date.
+
+    Each worker keeps a small pool of connections (a forked worker starts its own), and every
+    listing is an indexed query, so there is no directory index to keep fresh. Completing a
+    session and an import are single transactions.
+    """
+    POOL_SIZE = 8
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = []
+        with self._connection(write=True) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS workouts (
+                    state TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    athlete TEXT NOT NULL,
+                    date TEXT,
+                    content TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    PRIMARY KEY (state, filename)
+                );
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_workouts_athlete_date ON workouts (state, athlete, date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS exercises (position INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self, write=False):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid, self._pool = os.getpid(), []
+            conn = self._pool.pop() if self._pool else None
+        if conn is None:
+            conn = self._open()
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if write:
+                conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            with self._lock:
+                keep = self._pid == os.getpid() and len(self._pool) < self.POOL_SIZE
+                if keep:
+                    self._pool.append(conn)
+            if not keep:
+                conn.close()
+
+    @staticmethod
+    def _row(state, filename, content):
+        date = get_workout_date(filename)
+        return (state, filename, filename.split('_')[0].lower(), date.strftime('%Y-%m-%d') if date else None,
+                content, time.time_ns())
+
+    def _upsert(self, conn, rows):
+        conn.executemany(
+            "INSERT OR REPLACE INTO workouts (state, filename, athlete, date, content, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def _store_exercises(self, conn, names):
+        conn.execute("DELETE FROM exercises")
+        conn.executemany("INSERT INTO exercises (position, name) VALUES (?, ?)", list(enumerate(names)))
+        conn.execute('''
+            INSERT INTO store_meta (key, value) VALUES ('exercises_version', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+        ''')
+
+    def entries(self, state, athlete):
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT filename FROM workouts WHERE state = ? AND athlete = ? ORDER BY date IS NULL, date, filename",
+                (state, athlete.lower())
+            ).fetchall()
+        return [(get_workout_date(f), f) for f, in rows]
+
+    def athletes(self, state):
+        with self._connection() as conn:
+            return [a for a, in conn.execute("SELECT DISTINCT athlete FROM workouts WHERE state = ? ORDER BY athlete", (state,))]
+
+    def read(self, state, filename):
+        count_io('db_read')
+        with self._connection() as conn:
+            row = conn.execute("SELECT content FROM workouts WHERE state = ? AND filename = ?", (state, filename)).fetchone()
+        if row is None:
+            raise FileNotFoundError(filename)
+        return row[0]
+
+    def stat(self, state, filename):
+        with self._connection() as conn:
+            row = conn.execute("SELECT mtime_ns, length(CAST(content AS BLOB)) FROM workouts WHERE state = ? AND filename = ?",
+                               (state, filename)).fetchone()
+        return tuple(row) if row else None
+
+    def signatures(self, state, athlete):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT filename, mtime_ns, length(CAST(content AS BLOB)) FROM workouts WHERE state = ? AND athlete = ?",
+                                (state, athlete.lower())).fetchall()
+        return {f: (mtime_ns, size) for f, mtime_ns, size in rows}
+
+    def write(self, state, filename, content):
+        self.write_many(state, {filename: content})
+
+    def write_many(self, state, files):
+        with self._connection(write=True) as conn:
+            self._upsert(conn, [self._row(state, f, content) for f, content in files.items()])
+        count_io('db_write', len(files))
+
+    def remove(self, state, filename):
+        with self._connection(write=True) as conn:
+            removed = conn.execute("DELETE FROM workouts WHERE state = ? AND filename = ?", (state, filename)).rowcount
+        return removed > 0
+
+    def complete(self, plan_filename, tracked_filename, content):
+        with self._connection(write=True) as conn:
+            self._upsert(conn, [self._row('finished', tracked_filename, content)])
+            conn.execute("DELETE FROM workouts WHERE state = 'inprogress' AND filename = ?", (tracked_filename,))
+            conn.execute("DELETE FROM workouts WHERE state = 'planned' AND filename = ?", (plan_filename,))
+        count_io('db_write')
+
+    def replace(self, files, exercises=None):
+        with self._connection(write=True) as conn:
+            self._upsert(conn, [self._row(state, f, content) for (state, f), content in files.items()])
+            if exercises is not None:
+                self._store_exercises(conn, exercises)
+        count_io('db_write', len(files))
+
+    def exercises_signature(self):
+        with self._connection() as conn:
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'exercises_version'").fetchone()
+        return row[0] if row else None
+
+    def exercises(self):
+        count_io('db_read')
+        with self._connection() as conn:
+            return [name for name, in conn.execute("SELECT name FROM exercises ORDER BY position")]
+
+    def save_exercises(self, names):
+        with self._connection(write=True) as conn:
+            self._store_exercises(conn, names)
+        count_io('db_write')
+
+def open_storage(backend):
+    if backend == 'files':
+        return FileWorkoutStore()
+    if backend == 'sqlite':
+        return SqliteWorkoutStore(STORAGE_DB_PATH)
+    raise ValueError(f"Unknown storage backend {backend!r}; expected 'files' or 'sqlite'.")
+
+storage = open_storage(STORAGE_BACKEND)
+
+# --- ATHLETE ROSTER ---
+class RosterCache:
+    """Per-worker copy of the athletes table.
+
+    PRAGMA data_version on a long-lived connection changes whenever another connection commits to
+    users.db, which metrics, the outbox and session events do all the time. Only then is the
+    roster_version counter read, and the roster is re-read only when apply_roster has bumped it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._roster_version = None
+        self._athletes = []
+        self._emails = {}
+
+    def _refresh(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        # Read before the athletes, so a change committed in between only causes one more re-read.
+        roster_version = self._conn.execute("SELECT version FROM roster_version").fetchone()[0]
+        if roster_version != self._roster_version:
+            rows = self._conn.execute("SELECT name, email FROM athletes ORDER BY name COLLATE NOCASE").fetchall()
+            self._athletes = [{'name': name, 'email': email} for name, email in rows]
+            self._emails = {name.lower(): email for name, email in rows}
+            self._roster_version = roster_version
+        self._data_version = data_version
+
+    def athletes(self):
+        with self._lock:
+            self._refresh()
+            return self._athletes
+
+    def email_for(self, athlete_name):
+        with self._lock:
+            self._refresh()
+            return self._emails.get(athlete_name.lower())
+
+roster = RosterCache()
+
 # --- EMAIL FUNCTIONS ---
 def get_athlete_email(athlete_name):
     try:
-        with open(EMAILS_PATH, mode='r') as infile:
-            reader = csv.reader(infile)
-            next(reader, None)
-            for row in reader:
-                if row and row[0].lower() == athlete_name.lower():
-                    return row[1]
-    except FileNotFoundError:
-        app.logger.error(f"Email file not found at {EMAILS_PATH}")
+        return roster.email_for(athlete_name) or None
     except Exception as e:
-        app.logger.error(f"Error reading email file: {e}")
+        app.logger.error(f"Error reading athlete roster: {e}")
     return None
 
-def send_email_with_python(recipient_email, subject, body, attachment_path):
-    sender_email = os.environ.get('EMAIL_USER')
-    sender_password = os.environ.get('EMAIL_PASS')
-    smtp_server = os.environ.get('EMAIL_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('EMAIL_PORT', 587))
+def get_smtp_settings():
+    return {
+        'user': os.environ.get('EMAIL_USER'),
+        'password': os.environ.get('EMAIL_PASS'),
+        'server': os.environ.get('EMAIL_SERVER', 'smtp.gmail.com'),
+        'port': int(os.environ.get('EMAIL_PORT', 587)),
+        'use_tls': os.environ.get('EMAIL_USE_TLS', '1') != '0',
+    }
+
+def build_email_message(sender_email, recipient_email, subject, body, attachment_name, attachment_bytes):
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.base import MIMEBase
+    from email import encoders
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    if attachment_bytes is not None:
+        part = MIMEBase("application", "octet-stream")
+        part.set_payload(attachment_bytes)
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", f"attachment; filename= {attachment_name}")
+        msg.attach(part)
+    return msg
+
+# --- EMAIL OUTBOX ---
+# Requests only enqueue into the email_outbox table. A background thread in each worker claims
+# due messages in batches, sends them over one reused SMTP connection and retries with backoff.
+# Claims are taken under BEGIN IMMEDIATE so the 4 gunicorn workers never send the same row twice;
+# rows left in 'sending' by a crashed worker are reclaimed after OUTBOX_CLAIM_TIMEOUT. Sent rows
+# are deleted once they are OUTBOX_SENT_RETENTION old; failed ones stay for inspection.
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 30
+OUTBOX_RETRY_MAX = 6 * 60 * 60
+OUTBOX_POLL_INTERVAL = 30
+OUTBOX_COALESCE_DELAY = 2
+OUTBOX_CLAIM_TIMEOUT = 10 * 60
+OUTBOX_SENT_RETENTION = 7 * 24 * 60 * 60
+OUTBOX_PURGE_INTERVAL = 60 * 60
+SMTP_TIMEOUT = 30
+SMTP_IDLE_TIMEOUT = 60
+
+def enqueue_email(recipient_email, subject, body, attachment_name, attachment_bytes):
+    now = time.time()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO email_outbox (recipient, subject, body, attachment_name, attachment, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (recipient_email, subject, body, attachment_name, attachment_bytes, now, now)
+        )
+    outbox_sender.wake()
+
+def claim_outbox_batch(limit=OUTBOX_BATCH_SIZE):
+    now = time.time()
+    with immediate_transaction() as conn:
+        rows = conn.execute('''
+            SELECT * FROM email_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at <= ?)
+            ORDER BY id LIMIT ?
+        ''', (now, now - OUTBOX_CLAIM_TIMEOUT, limit)).fetchall()
+        conn.executemany("UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?", [(now, row['id']) for row in rows])
+    return [dict(row) for row in rows]
+
+def mark_outbox_sent(message_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("UPDATE email_outbox SET status = 'sent', sent_at = ?, attachment = NULL, last_error = NULL WHERE id = ?", (time.time(), message_id))
+
+def purge_sent_outbox(retention=OUTBOX_SENT_RETENTION):
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - retention,)).rowcount
+
+def reschedule_outbox_message(message, error):
+    attempts = message['attempts'] + 1
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        status, next_attempt_at = 'failed', message['next_attempt_at']
+        app.logger.error(f"Giving up on email {message['id']} to {message['recipient']} after {attempts} attempts. Error: {error}")
+    else:
+        status, next_attempt_at = 'pending', time.time() + min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+        app.logger.warning(f"Failed to send email {message['id']} to {message['recipient']} (attempt {attempts}), will retry. Error: {error}")
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, next_attempt_at, str(error), message['id'])
+        )
+
+class OutboxSender:
+    """Background drainer for the email outbox, one per worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._smtp = None
+        self._smtp_last_used = 0
+        self._last_purge = 0
+        self._warned_unconfigured = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
 
-    if not all([sender_email, sender_password]):
-        app.logger.error("Email credentials (EMAIL_USER, EMAIL_PASS) are not set in environment variables. Cannot send email.")
+    def _run(self):
+        while True:
+            if self._wake.wait(OUTBOX_POLL_INTERVAL):
+                # Give workouts finishing together a moment to land in the same batch.
+                time.sleep(OUTBOX_COALESCE_DELAY)
+            self._wake.clear()
+            try:
+                while self.drain() == OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                app.logger.error(f"Email outbox drain failed: {e}")
+            if time.time() - self._last_purge > OUTBOX_PURGE_INTERVAL:
+                self._last_purge = time.time()
+                try:
+                    purge_sent_outbox()
+                except sqlite3.Error as e:
+                    app.logger.warning(f"Could not purge sent emails from the outbox: {e}")
+            if self._smtp is not None and time.time() - self._smtp_last_used > SMTP_IDLE_TIMEOUT:
+                self._disconnect()
+
+    def _connection(self, settings):
+        import smtplib
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._disconnect()
+        server = smtplib.SMTP(settings['server'], settings['port'], timeout=SMTP_TIMEOUT)
+        try:
+            if settings['use_tls']:
+                server.starttls()
+            server.login(settings['user'], settings['password'])
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def drain(self):
+        """Claims one batch of due messages and sends it. Returns the number of messages claimed."""
+        settings = get_smtp_settings()
+        if not all([settings['user'], settings['password']]):
+            if not self._warned_unconfigured:
+                app.logger.error("Email credentials (EMAIL_USER, EMAIL_PASS) are not set in environment variables. "
+                                 "Queued emails will wait until they are.")
+                self._warned_unconfigured = True
+            return 0
+        self._warned_unconfigured = False
+        batch = claim_outbox_batch()
+        for index, message in enumerate(batch):
+            started = time.perf_counter()
+            try:
+                smtp = self._connection(settings)
+            except Exception as e:
+                metrics.add('dunamis_smtp_seconds_total', time.perf_counter() - started)
+                metrics.add('dunamis_emails_total', len(batch) - index, result='deferred')
+                app.logger.error(f"Could not connect to SMTP server {settings['server']}:{settings['port']}. Error: {e}")
+                for pending in batch[index:]:
+                    reschedule_outbox_message(pending, e)
+                break
+            try:
+                msg = build_email_message(settings['user'], message['recipient'], message['subject'], message['body'],
+                                          message['attachment_name'], message['attachment'])
+                smtp.sendmail(settings['user'], message['recipient'], msg.as_string())
+                metrics.add('dunamis_emails_total', result='sent')
+                self._smtp_last_used = time.time()
+                mark_outbox_sent(message['id'])
+                app.logger.info(f"Successfully sent workout email to {message['recipient']} via Python smtplib.")
+            except Exception as e:
+                metrics.add('dunamis_emails_total', result='failed')
+                self._disconnect()
+                reschedule_outbox_message(message, e)
+            finally:
+                metrics.add('dunamis_smtp_seconds_total', time.perf_counter() - started)
+        return len(batch)
+
+outbox_sender = OutboxSender()
+
+@app.before_request
+def start_outbox_sender():
+    outbox_sender.start()
+
+
+# --- IN-PROGRESS SESSION JOURNAL ---
+# Each in-progress session carries a version. A full save replaces the CSV; a delta save appends
+# only the changed set rows to progress_journal. Both are rejected when the client's version is
+# stale; a session opened from a plan starts at version 0, so two devices starting the same plan
+# cannot both save it. The journal is folded into the CSV when the session is read back or completed.
+PROGRESS_DELTA_COLUMNS = {
+    'actual_reps': ('Actual Reps',),
+    'actual_weight': ('Actual Weight (lb)',),
+    'rir': ('RIR', 'Reps in Reserve (RIR)'),
+    'notes': ('Athlete Notes', 'Notes'),
+}
+
+class StaleVersionError(Exception):
+    def __init__(self, current_version):
+        super().__init__(f"Stale workout version; current version is {current_version}.")
+        self.current_version = current_version
+
+def _progress_version(conn, filename):
+    row = conn.execute("SELECT version FROM progress_sessions WHERE filename = ?", (filename,)).fetchone()
+    return row['version'] if row else 0
+
+def _check_progress_version(conn, filename, expected_version):
+    current = _progress_version(conn, filename)
+    if expected_version != current:
+        raise StaleVersionError(current)
+    return current
+
+def get_progress_version(filename):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        return _progress_version(conn, filename)
+
+def save_progress_snapshot(filename, csv_content, expected_version):
+    with immediate_transaction() as conn:
+        version = _check_progress_version(conn, filename, expected_version) + 1
+        try:
+            previous = storage.read('inprogress', filename)
+        except FileNotFoundError:
+            previous = ''
+        storage.write('inprogress', filename, csv_content)
+        publish_session_event(conn, filename, 'progress', version, changed_sets(previous, csv_content))
+        index_workout_notes(conn, 'inprogress', filename, csv_content)
+        conn.execute("DELETE FROM progress_journal WHERE filename = ?", (filename,))
+        conn.execute("INSERT OR REPLACE INTO progress_sessions (filename, version) VALUES (?, ?)", (filename, version))
+    return version
+
+def append_progress_delta(filename, expected_version, changes):
+    with immediate_transaction() as conn:
+        version = _check_progress_version(conn, filename, expected_version) + 1
+        if not storage.exists('inprogress', filename):
+            raise StaleVersionError(version - 1)
+        conn.execute(
+            "INSERT INTO progress_journal (filename, version, changes, created_at) VALUES (?, ?, ?, ?)",
+            (filename, version, json.dumps(changes), time.time())
+        )
+        conn.execute("INSERT OR REPLACE INTO progress_sessions (filename, version) VALUES (?, ?)", (filename, version))
+        publish_session_event(conn, filename, 'progress', version, [
+            {'exercise': str(c['exercise']), 'set': str(c['set']), **{f: c[f] for f in PROGRESS_DELTA_COLUMNS if f in c}}
+            for c in changes
+        ])
+        update_athlete_notes(conn, filename, {str(c['exercise']): c['notes'] for c in changes if 'notes' in c})
+    return version
+
+def _compact_progress(conn, filename):
+    journal = conn.execute("SELECT changes FROM progress_journal WHERE filename = ? ORDER BY version", (filename,)).fetchall()
+    if not journal:
         return
+    count_io('csv_parse')
+    reader = csv.reader(io.StringIO(storage.read('inprogress', filename), newline=''))
+    header = next(reader, [])
+    records = [row + [''] * (len(header) - len(row)) for row in reader if row]
+    exercise_col, set_col = header.index('Exercise'), header.index('Set')
+    by_set = {(row[exercise_col].strip().lower(), row[set_col].strip()): row for row in records}
+    for entry in journal:
+        for change in json.loads(entry['changes']):
+            row = by_set.get((str(change['exercise']).strip().lower(), str(change['set']).strip()))
+            if row is None:
+                app.logger.warning(f"Dropping journaled change for unknown set {change['exercise']!r} #{change['set']} in '{filename}'")
+                continue
+            for field, candidates in PROGRESS_DELTA_COLUMNS.items():
+                if field not in change:
+                    continue
+                column = next((c for c in candidates if c in header), None)
+                if column is None:
+                    column = candidates[0]
+                    header.append(column)
+                    for record in records:
+                        record.append('')
+                row[header.index(column)] = '' if change[field] is None else str(change[field])
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(records)
+    storage.write('inprogress', filename, out.getvalue())
+    index_workout_notes(conn, 'inprogress', filename, out.getvalue())
+    conn.execute("DELETE FROM progress_journal WHERE filename = ?", (filename,))
+
+def compact_progress(filename):
+    """Folds any journaled deltas into the in-progress CSV."""
+    with immediate_transaction() as conn:
+        _compact_progress(conn, filename)
+
+def finalize_progress(plan_filename, filename, csv_content, expected_version):
+    """Moves a session to finished and closes out its versioning. Without csv_content, the
+    compacted in-progress CSV is stored; the stored CSV is returned.
+
+    The store is updated first, under the users.db write lock, and the session's version, journal,
+    completion event and notes commit after it. A crash in between leaves the session open at the
+    same version, so the completion can be sent again; storage.complete simply repeats.
+    """
+    with immediate_transaction() as conn:
+        _check_progress_version(conn, filename, expected_version)
+        if csv_content is None:
+            _compact_progress(conn, filename)
+            csv_content = storage.read('inprogress', filename)
+        storage.complete(plan_filename, filename, csv_content)
+        conn.execute("DELETE FROM progress_journal WHERE filename = ?", (filename,))
+        conn.execute("DELETE FROM progress_sessions WHERE filename = ?", (filename,))
+        publish_session_event(conn, filename, 'completed', None, changed_sets('', csv_content))
+        index_workout_notes(conn, 'finished', filename, csv_content)
+    return csv_content
+
+def parse_progress_version(data):
+    """The client's session version from a request body, or None when it is missing or not an integer."""
+    version = data.get('version')
+    return version if isinstance(version, int) and not isinstance(version, bool) and version >= 0 else None
+
+def missing_version_response():
+    return jsonify({"status": "error", "message": "Saves need the workout's version (0 for a session opened from a plan)."}), 400
+
+def stale_version_response(error):
+    return jsonify({
+        "status": "error",
+        "message": "This workout was changed on another device. Reload it before saving.",
+        "version": error.current_version
+    }), 409
 
+# --- LIVE SESSION EVENTS ---
+# Every save and completion appends a row of set-level changes to session_events in users.db, so
+# a change handled by any gunicorn worker reaches the streams held open by every other worker.
+# Rows older than SESSION_EVENT_RETENTION_SECONDS are pruned as new ones arrive; that is also how
+# far back a reconnecting stream can catch up through Last-Event-ID.
+SESSION_EVENT_RETENTION_SECONDS = 3600
+SESSION_EVENT_POLL_SECONDS = 0.5
+SESSION_EVENT_QUEUE_SIZE = 1000
+SESSION_STREAM_HEARTBEAT_SECONDS = 15
+SESSION_STREAM_MAX_SECONDS = 300
+SESSION_STREAM_RETRY_MS = 2000
+
+def _logged_sets(csv_text):
+    """Maps (exercise, set) to the PROGRESS_DELTA_COLUMNS fields of each row of a workout CSV."""
+    sets = {}
+    for row in csv.DictReader(io.StringIO(csv_text or '')):
+        exercise = (row.get('Exercise') or '').strip()
+        if not exercise:
+            continue
+        fields = {field: next((row[c] for c in candidates if row.get(c) is not None), '')
+                  for field, candidates in PROGRESS_DELTA_COLUMNS.items()}
+        sets[(exercise, (row.get('Set') or '').strip())] = fields
+    return sets
+
+def changed_sets(previous_csv, csv_text):
+    """Set rows of csv_text whose logged values differ from previous_csv; new rows count only once logged."""
+    before = _logged_sets(previous_csv)
+    return [{'exercise': exercise, 'set': set_number, **fields}
+            for (exercise, set_number), fields in _logged_sets(csv_text).items()
+            if before.get((exercise, set_number), dict.fromkeys(fields, '')) != fields]
+
+def publish_session_event(conn, filename, kind, version, sets):
+    """Records a session change on conn, so it commits (or rolls back) with the save itself."""
+    now = time.time()
+    conn.execute(
+        "INSERT INTO session_events (athlete, filename, kind, version, sets, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (filename.split('_')[0], filename, kind, version, json.dumps(sets), now)
+    )
+    conn.execute("DELETE FROM session_events WHERE created_at < ?", (now - SESSION_EVENT_RETENTION_SECONDS,))
+
+class SessionEventBus:
+    """Per-worker fan-out of session_events rows to the open event streams.
+
+    One thread polls users.db only while some stream is subscribed. PRAGMA data_version on its own
+    connection changes only when another connection commits, so an idle poll is a single pragma.
+    A subscriber that falls SESSION_EVENT_QUEUE_SIZE events behind is dropped; its client
+    reconnects with Last-Event-ID and catches up from the table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._conn = None
+        self._data_version = None
+        self._last_id = 0
+        self._thread = None
+
+    def _rows_after(self, after_id, up_to=None):
+        query = "SELECT id, athlete, filename, kind, version, sets, created_at FROM session_events WHERE id > ?"
+        params = [after_id]
+        if up_to is not None:
+            query += " AND id <= ?"
+            params.append(up_to)
+        return self._conn.execute(query + " ORDER BY id", params).fetchall()
+
+    def subscribe(self, athletes=None, after_id=None):
+        """Returns a queue of event dicts for the given athletes (all when None), starting after after_id."""
+        subscriber = queue.Queue(maxsize=SESSION_EVENT_QUEUE_SIZE)
+        wanted = {a.lower() for a in athletes} if athletes else None
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            if self._thread is None:
+                self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM session_events").fetchone()[0]
+                self._thread = threading.Thread(target=self._run, name='session-events', daemon=True)
+                self._thread.start()
+            if after_id is not None:
+                for row in self._rows_after(after_id, self._last_id)[:SESSION_EVENT_QUEUE_SIZE]:
+                    self._offer(subscriber, wanted, row)
+            self._subscribers[subscriber] = wanted
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def _offer(self, subscriber, wanted, row):
+        event_id, athlete, filename, kind, version, sets, created_at = row
+        if wanted is not None and athlete.lower() not in wanted:
+            return True
+        try:
+            subscriber.put_nowait({'id': event_id, 'athlete': athlete, 'filename': filename, 'kind': kind,
+                                   'version': version, 'sets': json.loads(sets), 'created_at': created_at})
+            return True
+        except queue.Full:
+            return False
+
+    def _poll(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        rows = self._rows_after(self._last_id)
+        if not rows:
+            return
+        self._last_id = rows[-1][0]
+        for subscriber, wanted in list(self._subscribers.items()):
+            if not all(self._offer(subscriber, wanted, row) for row in rows):
+                del self._subscribers[subscriber]
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(None)
+
+    def _run(self):
+        while True:
+            time.sleep(SESSION_EVENT_POLL_SECONDS)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+                try:
+                    self._poll()
+                except sqlite3.Error as e:
+                    app.logger.error(f"Session event poll failed: {e}", extra={'rate_limit': 'session_events'})
+
+session_events = SessionEventBus()
+
+def format_session_event(event):
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+@app.route('/api/session_events', methods=['GET'])
+@login_required
+def stream_session_events():
+    """Server-Sent Events of set-level changes to in-progress sessions.
+
+    Coaches may pass ?athlete= (repeatable) to watch some athletes, or nothing for all of them;
+    athletes only ever see their own sessions. Each stream closes after SESSION_STREAM_MAX_SECONDS
+    and the browser's EventSource reconnects with Last-Event-ID, so no worker thread is held forever.
+    """
+    athletes = request.args.getlist('athlete') if current_user.role == 'coach' else [current_user.username]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
     try:
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        with open(attachment_path, "rb") as attachment:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        part.add_header("Content-Disposition", f"attachment; filename= {os.path.basename(attachment_path)}")
-        msg.attach(part)
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Last-Event-ID must be an event id."}), 400
+    subscriber = session_events.subscribe(athletes or None, after_id)
 
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, recipient_email, text)
-        server.quit()
-        app.logger.info(f"Successfully sent workout email to {recipient_email} via Python smtplib.")
-    except Exception as e:
-        app.logger.error(f"Failed to send email to {recipient_email} via Python smtplib. Error: {e}")
+    def generate():
+        try:
+            yield f"retry: {SESSION_STREAM_RETRY_MS}\n\n"
+            deadline = time.monotonic() + SESSION_STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=SESSION_STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield format_session_event(event)
+        finally:
+            session_events.unsubscribe(subscriber)
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- NOTES SEARCH ---
+NOTE_SOURCES = {'coach': ("Coach's Notes",), 'athlete': ('Athlete Notes', 'Notes')}
+NOTES_SEARCH_DEFAULT_LIMIT = 50
+NOTES_SEARCH_MAX_LIMIT = 200
+# Writes through the app index notes as they happen, so a search only compares the store's listing
+# (kept by its directory-mtime check) with notes_files. Files edited in place outside the app keep
+# their names; every NOTES_RESCAN_INTERVAL a search also compares each file's (mtime_ns, size).
+NOTES_RESCAN_INTERVAL = 5 * 60
+# Per-worker {athlete or None: ({filename: state} in storage, notes_files row count)} as of the last
+# sync; while neither changes there is nothing to reconcile.
+_notes_synced = {}
+# Per-worker {athlete or None: time.monotonic() of the last signature comparison}.
+_notes_rescanned = {}
+
+@lru_cache(maxsize=None)
+def notes_fts_available():
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone() is not None
 
+def extract_workout_notes(csv_text):
+    """Distinct (exercise, source, note) triples of a workout CSV; the tracker repeats a note on every set."""
+    notes = {}
+    for row in csv.DictReader(io.StringIO(csv_text or '')):
+        exercise = (row.get('Exercise') or '').strip()
+        if not exercise:
+            continue
+        for source, columns in NOTE_SOURCES.items():
+            note = next(((row.get(c) or '').strip() for c in columns if (row.get(c) or '').strip()), '')
+            if note:
+                notes[(exercise, source, note)] = None
+    return list(notes)
+
+def forget_workout_notes(conn, filename):
+    conn.execute("DELETE FROM workout_notes WHERE filename = ?", (filename,))
+    conn.execute("DELETE FROM notes_files WHERE filename = ?", (filename,))
+
+def index_workout_notes(conn, state, filename, csv_text):
+    """Replaces the indexed notes of one workout file with those in csv_text, as storage now holds it."""
+    forget_workout_notes(conn, filename)
+    date = get_workout_date(filename)
+    date = date.strftime('%Y-%m-%d') if date else None
+    athlete = filename.split('_')[0]
+    conn.executemany(
+        "INSERT INTO workout_notes (filename, athlete, exercise, date, source, note) VALUES (?, ?, ?, ?, ?, ?)",
+        [(filename, athlete, exercise, date, source, note) for exercise, source, note in extract_workout_notes(csv_text)]
+    )
+    mtime_ns, size = storage.stat(state, filename) or (None, None)
+    conn.execute("INSERT INTO notes_files (filename, athlete, state, mtime_ns, size) VALUES (?, ?, ?, ?, ?)",
+                 (filename, athlete, state, mtime_ns, size))
+
+def update_athlete_notes(conn, filename, notes_by_exercise):
+    """Applies journaled athlete notes; a file not indexed yet is picked up whole by the next search."""
+    if not notes_by_exercise or conn.execute("SELECT 1 FROM notes_files WHERE filename = ?", (filename,)).fetchone() is None:
+        return
+    date = get_workout_date(filename)
+    date = date.strftime('%Y-%m-%d') if date else None
+    for exercise, note in notes_by_exercise.items():
+        conn.execute("DELETE FROM workout_notes WHERE filename = ? AND exercise = ? AND source = 'athlete'", (filename, exercise))
+        note = '' if note is None else str(note).strip()
+        if note:
+            conn.execute(
+                "INSERT INTO workout_notes (filename, athlete, exercise, date, source, note) VALUES (?, ?, ?, ?, 'athlete', ?)",
+                (filename, filename.split('_')[0], exercise, date, note)
+            )
+
+def _catalog_workouts(athlete=None, signatures=False):
+    """{filename: state} for the in-progress and finished workouts in storage, or with signatures
+    {filename: (state, mtime_ns, size)}, which costs a stat() per file on the file backend."""
+    workouts = {}
+    for state in ('inprogress', 'finished'):
+        for name in ([athlete.lower()] if athlete else storage.athletes(state)):
+            if signatures:
+                workouts.update((f, (state, *signature)) for f, signature in storage.signatures(state, name).items())
+            else:
+                workouts.update((f, state) for f in storage.files(state, name))
+    return workouts
+
+def sync_notes_index(athlete=None):
+    """Indexes workouts written or edited outside the app (or before the index existed) and drops vanished ones."""
+    where, params = (" WHERE athlete = ?", (athlete,)) if athlete else ("", ())
+    key = athlete.lower() if athlete else None
+    rescan = time.monotonic() - _notes_rescanned.get(key, -NOTES_RESCAN_INTERVAL) >= NOTES_RESCAN_INTERVAL
+
+    def stale(conn):
+        rows = conn.execute("SELECT filename, state, mtime_ns, size FROM notes_files" + where, params).fetchall()
+        indexed = {f: (state, mtime_ns, size) if rescan else state for f, state, mtime_ns, size in rows}
+        return ([(f, entry[0] if rescan else entry) for f, entry in in_store.items() if indexed.get(f) != entry],
+                [f for f in indexed if f not in in_store])
+
+    listing = _catalog_workouts(athlete)
+    in_store = _catalog_workouts(athlete, signatures=True) if rescan else listing
+    with sqlite3.connect(DB_PATH) as conn:
+        indexed_count = conn.execute("SELECT COUNT(*) FROM notes_files" + where, params).fetchone()[0]
+        if not rescan and _notes_synced.get(key) == (listing, indexed_count):
+            return
+        missing, vanished = stale(conn)
+    if rescan:
+        _notes_rescanned[key] = time.monotonic()
+    if not missing and not vanished:
+        _notes_synced[key] = (listing, indexed_count)
+        return
+    with immediate_transaction() as conn:
+        missing, vanished = stale(conn)
+        for filename in vanished:
+            forget_workout_notes(conn, filename)
+        for filename, state in missing:
+            try:
+                if state == 'inprogress':
+                    # The file lags its journal, whose athlete notes are already in the index.
+                    _compact_progress(conn, filename)
+                count_io('csv_parse')
+                index_workout_notes(conn, state, filename, storage.read(state, filename))
+            except (OSError, ValueError, csv.Error) as e:
+                app.logger.warning(f"Could not index notes of '{filename}': {e}")
+    if len(missing) > 1:
+        app.logger.info(f"Indexed notes of {len(missing)} workout files")
+
+def search_workout_notes(text, athlete=None, exercise=None, start=None, end=None, source=None, limit=NOTES_SEARCH_DEFAULT_LIMIT):
+    """Notes matching every word of text (prefixes and word stems match too), newest first."""
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return []
+    conditions, params = [], []
+    if notes_fts_available():
+        sql = ("SELECT n.athlete, n.filename, f.state, n.exercise, n.date, n.source, n.note FROM notes_fts "
+               "JOIN workout_notes n ON n.id = notes_fts.rowid JOIN notes_files f ON f.filename = n.filename")
+        conditions.append("notes_fts MATCH ?")
+        params.append(' '.join(f'"{term}"*' for term in terms))
+    else:
+        sql = ("SELECT n.athlete, n.filename, f.state, n.exercise, n.date, n.source, n.note FROM workout_notes n "
+               "JOIN notes_files f ON f.filename = n.filename")
+        for term in terms:
+            conditions.append("n.note LIKE ?")
+            params.append(f"%{term}%")
+    for column, value in (('n.athlete = ?', athlete), ('n.exercise = ?', exercise), ('n.date >= ?', start),
+                          ('n.date <= ?', end), ('n.source = ?', source)):
+        if value:
+            conditions.append(column)
+            params.append(value)
+    sql += " WHERE " + " AND ".join(conditions) + " ORDER BY n.date DESC, n.filename, n.id LIMIT ?"
+    params.append(limit)
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+
+@app.route('/api/search_notes', methods=['GET'])
+@login_required
+def search_notes():
+    """?q= words to find, plus optional athlete, exercise, start/end (YYYY-MM-DD), source (coach|athlete) and limit."""
+    text = request.args.get('q', '').strip()
+    athlete = request.args.get('athlete') or None
+    if current_user.role != 'coach':
+        if athlete and athlete.lower() != current_user.username.lower():
+            return jsonify({"status": "error", "message": "Permission denied."}), 403
+        athlete = current_user.username
+    source = request.args.get('source') or None
+    if not re.search(r'\w', text):
+        return jsonify({"status": "error", "message": "Enter a word to search for."}), 400
+    if source and source not in NOTE_SOURCES:
+        return jsonify({"status": "error", "message": "Source must be 'coach' or 'athlete'."}), 400
+    try:
+        start, end = (datetime.date.fromisoformat(request.args[k]).isoformat() if request.args.get(k) else None
+                      for k in ('start', 'end'))
+        limit = min(int(request.args.get('limit', NOTES_SEARCH_DEFAULT_LIMIT)), NOTES_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must be YYYY-MM-DD and limit a number."}), 400
+    sync_notes_index(athlete)
+    results = search_workout_notes(text, athlete, request.args.get('exercise') or None, start, end, source, max(limit, 1))
+    return jsonify({"status": "success", "results": results})
 
 # --- USER MANAGEMENT & CORE ROUTES ---
 @app.route('/login', methods=['GET', 'POST'])
@@ -207,65 +1803,41 @@ def get_current_user():
 @app.route('/api/get_athletes', methods=['GET'])
 @coach_required
 def get_athletes():
-    """Reads athlete names and emails from the api/emails.csv file."""
-    athletes = []
+    """Returns the athlete roster, sorted by name."""
     try:
-        if not os.path.exists(EMAILS_PATH):
-            with open(EMAILS_PATH, mode='w', newline='') as infile:
-                writer = csv.writer(infile)
-                writer.writerow(['Athlete', 'Email'])
-        
-        with open(EMAILS_PATH, mode='r', newline='') as infile:
-            reader = csv.DictReader(infile)
-            for row in reader:
-                if row and row.get('Athlete'):
-                    athletes.append({'name': row['Athlete'], 'email': row.get('Email', '')})
-        app.logger.info(f"Loaded {len(athletes)} athletes from emails.csv")
-        athletes.sort(key=lambda x: x['name'].lower())
-        return jsonify({"status": "success", "athletes": athletes})
-    except FileNotFoundError:
-        app.logger.error(f"Could not find emails.csv at {EMAILS_PATH}")
-        return jsonify({"status": "error", "message": "emails.csv file not found."}), 404
+        return jsonify({"status": "success", "athletes": roster.athletes()})
     except Exception as e:
-        app.logger.error(f"Could not get athletes from email file: {e}")
-        return jsonify({"status": "error", "message": "Could not retrieve athlete list from email file."}), 500
+        app.logger.error(f"Could not get athletes from roster: {e}")
+        return jsonify({"status": "error", "message": "Could not retrieve athlete list."}), 500
 
 @app.route('/api/update_athletes', methods=['POST'])
 @coach_required
 def update_athletes():
-    """Receives a full list of athletes and overwrites the emails.csv file."""
+    """Receives a full list of athletes and applies the differences to the roster in one transaction."""
     updated_athletes_list = request.get_json()
     if not isinstance(updated_athletes_list, list):
         return jsonify({"status": "error", "message": "Invalid data format. Expected a list of athletes."}), 400
 
     try:
-        with open(EMAILS_PATH, mode='w', newline='') as outfile:
-            writer = csv.writer(outfile)
-            writer.writerow(['Athlete', 'Email'])
-            for athlete in updated_athletes_list:
-                if athlete.get('name') and athlete.get('email'):
-                    writer.writerow([athlete.get('name').strip(), athlete.get('email').strip()])
+        athletes = [(athlete.get('name').strip(), athlete.get('email').strip())
+                    for athlete in updated_athletes_list if athlete.get('name') and athlete.get('email')]
+        with immediate_transaction() as conn:
+            changed, removed = apply_roster(conn, athletes)
         
-        app.logger.info("Athlete email list has been updated.")
+        app.logger.info(f"Athlete roster has been updated ({changed} added or changed, {removed} removed).")
         return jsonify({"status": "success", "message": "Athlete list updated successfully."})
     except Exception as e:
-        app.logger.error(f"Error updating athletes file: {e}")
+        app.logger.error(f"Error updating athlete roster: {e}")
         return jsonify({"status": "error", "message": "Failed to update athlete list."}), 500
 
-def filter_files_by_user(files, username=None):
-    user_to_check = username or current_user.username
-    return [f for f in files if f.lower().startswith(user_to_check.lower() + '_')]
-
 @app.route('/api/list_workouts_for_tracker', methods=['GET'])
 @login_required
 def list_workouts_for_tracker():
     username_to_view = request.args.get('user', current_user.username)
     if current_user.role != 'coach' and username_to_view != current_user.username:
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    planned_files = [f for f in os.listdir(PLANNED_DIR) if f.endswith('.csv')]
-    in_progress_files = [f for f in os.listdir(INPROGRESS_DIR) if f.endswith('_tracked.csv')]
-    user_planned = filter_files_by_user(planned_files, username_to_view)
-    user_tracked = filter_files_by_user(in_progress_files, username_to_view)
+    user_planned = storage.files('planned', username_to_view)
+    user_tracked = storage.files('inprogress', username_to_view)
     plans_in_progress_base = {f.replace('_tracked.csv', '.csv') for f in user_tracked}
     active_plans = [p for p in user_planned if p not in plans_in_progress_base]
     return jsonify({
@@ -280,65 +1852,388 @@ def mesocycle_view():
     username_to_view = request.args.get('user', current_user.username)
     if current_user.role != 'coach' and username_to_view != current_user.username:
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    finished_files = filter_files_by_user([f for f in os.listdir(FINISHED_DIR) if f.endswith('_tracked.csv')], username_to_view)
-    planned_files = filter_files_by_user([f for f in os.listdir(PLANNED_DIR) if f.endswith('.csv')], username_to_view)
-    in_progress_bases = {f.replace('_tracked.csv', '.csv') for f in os.listdir(INPROGRESS_DIR)}
-    active_planned_files = [p for p in planned_files if p not in in_progress_bases]
-    def get_date(f):
-        try: return datetime.datetime.strptime(f.split('_')[-1].replace('.csv',''), '%Y-%m-%d')
-        except: return datetime.datetime.max
-    finished_files.sort(key=get_date, reverse=True)
-    active_planned_files.sort(key=get_date)
+    finished_files = storage.files('finished', username_to_view)[::-1]
+    in_progress_bases = {f.replace('_tracked.csv', '.csv') for f in storage.files('inprogress', username_to_view)}
+    active_planned_files = [p for p in storage.files('planned', username_to_view) if p not in in_progress_bases]
     return jsonify({"status": "success", "data": {"completed": finished_files[:5], "planned": active_planned_files[:6]}})
 
 @app.route('/api/get_analysis', methods=['GET'])
 @login_required
 def get_analysis():
+    """Per-exercise max weight and total volume by date.
+
+    Optional filters: exercise (repeatable), start and end (inclusive YYYY-MM-DD). format=columnar
+    returns {exercises, days, series} with dates as epoch days on one shared axis, and names_only=1
+    limits that to the exercise list. The ETag follows the athlete's finished files.
+    """
     username_to_view = request.args.get('user', current_user.username)
     if current_user.role != 'coach' and username_to_view != current_user.username:
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    user_files_fullpaths = [os.path.join(FINISHED_DIR, f) for f in filter_files_by_user([f for f in os.listdir(FINISHED_DIR) if f.endswith('_tracked.csv')], username_to_view)]
-    results = analyze_workout_data(user_files_fullpaths)
-    return jsonify({"status": "success", "analysis": results})
-
-def analyze_workout_data(file_list):
-    if not file_list: return {}
-    df_list = []
-    for i, file_path in enumerate(sorted(file_list)):
+    exercises = request.args.getlist('exercise') or None
+    start, end = request.args.get('start') or None, request.args.get('end') or None
+    columnar = request.args.get('format') == 'columnar'
+    names_only = columnar and request.args.get('names_only') == '1'
+    try:
+        for bound in (start, end):
+            if bound: datetime.date.fromisoformat(bound)
+    except ValueError:
+        return jsonify({"status": "error", "message": "start and end must be YYYY-MM-DD dates."}), 400
+    sync_analysis_store(username_to_view)
+    etag = hashlib.sha1(json.dumps([analysis_data_version(username_to_view), username_to_view.lower(),
+                                    exercises, start, end, columnar, names_only]).encode()).hexdigest()[:16]
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    elif columnar:
+        payload = {"status": "success", "exercises": analysis_exercise_names(username_to_view)}
+        if not names_only:
+            payload['days'], payload['series'] = encode_analysis_columnar(load_analysis_from_store(username_to_view, exercises, start, end))
+        response = jsonify(payload)
+    else:
+        response = jsonify({"status": "success", "analysis": load_analysis_from_store(username_to_view, exercises, start, end)})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- COLUMNAR WORKOUT ARCHIVE ---
+# Every finished set, one fixed-width binary file per column under workout_archive/<athlete>/,
+# memory-mapped on read. Exercise names are stored once in a per-athlete dictionary and the set
+# rows hold its codes, so a date-range or exercise-filtered read is a few vector comparisons over
+# the columns it needs and never parses text. The finished workouts in storage remain the record:
+# the archive is derived from them by the analysis store sync and can be deleted at any time.
+# It serves the last-performance lookups of the tracker and the coach dashboard's metrics;
+# get_analysis reads the per-file aggregates in users.db instead.
+ARCHIVE_COLUMNS = {
+    'file_id': 'int32', 'day': 'int32', 'exercise': 'int32', 'set_number': 'int16',
+    'reps': 'float32', 'weight': 'float32', 'rir': 'float32',
+}
+# Rewrite an archive once this share of its rows belongs to files that were re-archived or deleted.
+ARCHIVE_COMPACT_RATIO = 0.25
+
+class WorkoutArchive:
+    """Append-only per-athlete column store with tombstoned files and periodic compaction.
+
+    meta.json names the live generation directory, its row count, the exercise dictionary and
+    which file ids are retired. Writers hold an flock on the athlete's directory and publish meta.json
+    with os.replace only after the column bytes are on disk, so readers never lock and never see a
+    partial append. Compaction writes a new generation and keeps the previous one for readers
+    that are still mapped to it.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, athlete):
+        return os.path.join(self.root, athlete.lower())
+
+    def _column_path(self, athlete, generation, column):
+        return os.path.join(self._dir(athlete), f'gen-{generation}', f'{column}.bin')
+
+    def _read_meta(self, athlete):
         try:
-            df = pd.read_csv(file_path)
-            parts = os.path.basename(file_path).replace('_tracked.csv', '').split('_')
-            df['date'] = pd.to_datetime(parts[-1])
-            df_list.append(df)
-        except Exception as e:
-            app.logger.error(f"Could not process file {file_path}: {e}")
-    if not df_list: return {}
-    full_df = pd.concat(df_list, ignore_index=True)
-    full_df['Actual Weight'] = pd.to_numeric(full_df.get('Actual Weight (lb)'), errors='coerce').fillna(0)
-    full_df['Actual Reps'] = pd.to_numeric(full_df.get('Actual Reps'), errors='coerce').fillna(0)
-    full_df['volume'] = full_df['Actual Reps'] * full_df['Actual Weight']
-    agg_df = full_df.groupby(['Exercise', 'date']).agg(max_weight=('Actual Weight', 'max'), total_volume=('volume', 'sum')).reset_index()
-    return {name: g.sort_values('date').to_dict('list') for name, g in agg_df.groupby('Exercise')}
+            with open(os.path.join(self._dir(athlete), 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'generation': 0, 'rows': 0, 'dead_rows': 0, 'next_file_id': 0, 'exercises': [], 'files': {}, 'dead_files': []}
+
+    def _write_meta(self, athlete, meta):
+        path = os.path.join(self._dir(athlete), 'meta.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked_meta(self, athlete):
+        import fcntl
+        os.makedirs(self._dir(athlete), exist_ok=True)
+        with open(os.path.join(self._dir(athlete), '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                meta = self._read_meta(athlete)
+                yield meta
+                self._write_meta(athlete, meta)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _columns(self, athlete, meta):
+        import numpy as np
+        return {column: np.memmap(self._column_path(athlete, meta['generation'], column), dtype=dtype, mode='r', shape=(meta['rows'],))
+                for column, dtype in ARCHIVE_COLUMNS.items()}
+
+    def _append(self, athlete, meta, columns):
+        import numpy as np
+        os.makedirs(os.path.dirname(self._column_path(athlete, meta['generation'], 'day')), exist_ok=True)
+        for column, dtype in ARCHIVE_COLUMNS.items():
+            path = self._column_path(athlete, meta['generation'], column)
+            with open(path, 'ab') as f:
+                # Drop bytes left behind by an append that died before publishing meta.json.
+                f.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+                f.write(np.asarray(columns[column], dtype=dtype).tobytes())
+        count_io('archive_write')
+        meta['rows'] += len(columns['day'])
+
+    def _retire(self, meta, filename):
+        entry = meta['files'].pop(filename, None)
+        if entry:
+            meta['dead_files'].append(entry['id'])
+            meta['dead_rows'] += entry['rows']
+
+    def _compact(self, athlete, meta):
+        """Rewrites the live rows, ordered by day, into a new generation."""
+        import numpy as np
+        old = self._columns(athlete, meta)
+        live = np.flatnonzero(~np.isin(old['file_id'], meta['dead_files']))
+        live = live[np.argsort(old['day'][live], kind='stable')]
+        columns = {column: old[column][live] for column in ARCHIVE_COLUMNS}
+        del old
+        previous = meta['generation']
+        meta.update(generation=previous + 1, rows=0, dead_rows=0, dead_files=[])
+        self._append(athlete, meta, columns)
+        for entry in os.listdir(self._dir(athlete)):
+            if entry.startswith('gen-') and int(entry[4:]) < previous:
+                shutil.rmtree(os.path.join(self._dir(athlete), entry), ignore_errors=True)
+
+    def _maybe_compact(self, athlete, meta):
+        if meta['dead_rows'] and meta['dead_rows'] >= ARCHIVE_COMPACT_RATIO * meta['rows']:
+            self._compact(athlete, meta)
+
+    def athletes(self):
+        """Lowercased names of the athletes with an archive directory."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(entry for entry in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, entry)))
+
+    def files(self, athlete):
+        """Filenames currently archived for the athlete."""
+        return set(self._read_meta(athlete)['files'])
+
+    def replace_file(self, athlete, filename, set_rows):
+        """Appends a finished file's set rows, retiring any rows archived for it before."""
+        with self._locked_meta(athlete) as meta:
+            self._retire(meta, filename)
+            codes = {name.lower(): i for i, name in enumerate(meta['exercises'])}
+            columns = {column: [] for column in ARCHIVE_COLUMNS}
+            file_id = meta['next_file_id']
+            for exercise, date, set_number, reps, weight, rir in set_rows:
+                key = exercise.lower()
+                if key not in codes:
+                    codes[key] = len(meta['exercises'])
+                    meta['exercises'].append(exercise)
+                for column, value in (('file_id', file_id), ('day', epoch_day(date)), ('exercise', codes[key]), ('set_number', set_number),
+                                      ('reps', reps), ('weight', weight), ('rir', float('nan') if rir is None else rir)):
+                    columns[column].append(value)
+            self._append(athlete, meta, columns)
+            meta['files'][filename] = {'id': file_id, 'rows': len(set_rows)}
+            meta['next_file_id'] = file_id + 1
+            self._maybe_compact(athlete, meta)
+
+    def drop_file(self, athlete, filename):
+        with self._locked_meta(athlete) as meta:
+            self._retire(meta, filename)
+            self._maybe_compact(athlete, meta)
+
+    def read(self, athlete, start=None, end=None, exercises=None):
+        """Live set rows as arrays, optionally limited to an inclusive date range and exercise names.
+
+        Returns the ARCHIVE_COLUMNS arrays plus 'exercise_names', the dictionary 'exercise' indexes.
+        Rows of one file stay in their logged order.
+        """
+        import numpy as np
+        meta = self._read_meta(athlete)
+        if not meta['rows']:
+            empty = {column: np.zeros(0, dtype=dtype) for column, dtype in ARCHIVE_COLUMNS.items()}
+            return dict(empty, exercise_names=meta['exercises'])
+        columns = self._columns(athlete, meta)
+        count_io('archive_read')
+        mask = ~np.isin(columns['file_id'], meta['dead_files']) if meta['dead_files'] else np.ones(meta['rows'], dtype=bool)
+        if start is not None:
+            mask &= columns['day'] >= epoch_day(start)
+        if end is not None:
+            mask &= columns['day'] <= epoch_day(end)
+        if exercises is not None:
+            wanted = {name.lower() for name in exercises}
+            mask &= np.isin(columns['exercise'], [i for i, name in enumerate(meta['exercises']) if name.lower() in wanted])
+        rows = np.flatnonzero(mask)
+        return dict({column: np.array(values[rows]) for column, values in columns.items()}, exercise_names=meta['exercises'])
+
+workout_archive = WorkoutArchive(ARCHIVE_DIR)
+
+# --- ANALYSIS AGGREGATE STORE ---
+# Per-file (exercise, date) -> max_weight / total_volume rows live in users.db so every gunicorn
+# worker shares them, and each file's set rows go to the workout archive. A file is only
+# re-parsed when its mtime or size changes.
+RIR_COLUMNS = ('Reps in Reserve (RIR)', 'RIR')
+
+def _csv_number(text):
+    """The finite number in a CSV cell, or None when it is blank or not a number."""
+    try:
+        value = float((text or '').strip())
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+def summarize_workout_file(filename, csv_text):
+    """Reduces one finished workout file to aggregate rows and set rows."""
+    count_io('csv_parse')
+    reader = csv.DictReader(io.StringIO(csv_text, newline=''))
+    columns = reader.fieldnames or []
+    if 'Exercise' not in columns: return [], []
+    date = get_workout_date(filename)
+    if date is None:
+        raise ValueError("no date in the file name")
+    date = date.strftime('%Y-%m-%d')
+    has_sets = 'Actual Reps' in columns and 'Actual Weight (lb)' in columns
+    rir_column = next((c for c in RIR_COLUMNS if c in columns), None)
+    by_exercise, set_rows = {}, []
+    for row in reader:
+        exercise = row.get('Exercise')
+        if not exercise:
+            continue
+        weight = _csv_number(row.get('Actual Weight (lb)')) or 0.0
+        reps = _csv_number(row.get('Actual Reps')) or 0.0
+        max_weight, total_volume = by_exercise.get(exercise, (weight, 0.0))
+        by_exercise[exercise] = (max(max_weight, weight), total_volume + reps * weight)
+        if has_sets:
+            set_rows.append((exercise, date, int(_csv_number(row.get('Set')) or 0), reps, weight,
+                             _csv_number(row.get(rir_column)) if rir_column else None))
+    aggregates = [(exercise, date, max_weight, total_volume) for exercise, (max_weight, total_volume) in sorted(by_exercise.items())]
+    return aggregates, set_rows
+
+def summarize_stored_file(filename):
+    """(signature, aggregate rows, set rows) of one finished workout; parses without touching users.db."""
+    signature = storage.stat('finished', filename)
+    csv_text = storage.read('finished', filename)
+    try:
+        aggregates, set_rows = summarize_workout_file(filename, csv_text)
+    except Exception as e:
+        app.logger.error(f"Could not process file {filename}: {e}")
+        aggregates, set_rows = [], []
+    return signature, aggregates, set_rows
+
+def store_analysis_file(conn, athlete, filename, summary):
+    """Replaces the store and archive rows of one file with a summary from summarize_stored_file."""
+    signature, aggregates, set_rows = summary
+    forget_analysis_file(conn, athlete, filename)
+    conn.executemany(
+        "INSERT OR REPLACE INTO analysis_aggregates (athlete, filename, exercise, date, max_weight, total_volume) VALUES (?, ?, ?, ?, ?, ?)",
+        [(athlete.lower(), filename) + row for row in aggregates]
+    )
+    workout_archive.replace_file(athlete, filename, set_rows)
+    conn.execute(
+        "INSERT OR REPLACE INTO analysis_files (athlete, filename, mtime_ns, size) VALUES (?, ?, ?, ?)",
+        (athlete.lower(), filename) + signature
+    )
+
+def refresh_analysis_file(conn, athlete, filename):
+    """Re-summarizes a single finished file into the store and archive, replacing any previous rows for it."""
+    store_analysis_file(conn, athlete, filename, summarize_stored_file(filename))
+
+def forget_analysis_file(conn, athlete, filename):
+    for table in ('analysis_aggregates', 'analysis_files'):
+        conn.execute(f"DELETE FROM {table} WHERE athlete = ? AND filename = ?", (athlete.lower(), filename))
+
+def sync_analysis_store(athlete):
+    """Brings the athlete's store rows and archive in line with their finished workouts using signature checks only.
+
+    Changed files are parsed outside any transaction and committed one at a time, so a long first
+    sync never holds the users.db write lock for more than one file's rows.
+    """
+    on_disk = storage.signatures('finished', athlete)
+    archived = workout_archive.files(athlete)
+    with sqlite3.connect(DB_PATH) as conn:
+        known = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT filename, mtime_ns, size FROM analysis_files WHERE athlete = ?", (athlete.lower(),))}
+        for filename in set(known) - set(on_disk):
+            forget_analysis_file(conn, athlete, filename)
+    for filename in archived - set(on_disk):
+        workout_archive.drop_file(athlete, filename)
+    for filename, signature in on_disk.items():
+        if known.get(filename) != signature or filename not in archived:
+            try:
+                summary = summarize_stored_file(filename)
+            except FileNotFoundError:
+                continue
+            with sqlite3.connect(DB_PATH) as conn:
+                store_analysis_file(conn, athlete, filename, summary)
+
+def load_analysis_from_store(athlete, exercises=None, start=None, end=None):
+    """Returns {exercise: {'Exercise': [...], 'date': [...], 'max_weight': [...], 'total_volume': [...]}}.
+
+    exercises (names, case-insensitive) and the inclusive YYYY-MM-DD start/end bounds are optional filters.
+    """
+    clauses, params = ["athlete = ?"], [athlete.lower()]
+    if exercises is not None:
+        clauses.append(f"lower(exercise) IN ({', '.join('?' * len(exercises))})")
+        params.extend(name.lower() for name in exercises)
+    if start:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end:
+        clauses.append("date <= ?")
+        params.append(end)
+    results = {}
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute(f'''
+            SELECT exercise, date, MAX(max_weight), SUM(total_volume) FROM analysis_aggregates
+            WHERE {' AND '.join(clauses)} GROUP BY exercise, date ORDER BY exercise, date
+        ''', params)
+        for exercise, date, max_weight, total_volume in rows:
+            series = results.setdefault(exercise, {'Exercise': [], 'date': [], 'max_weight': [], 'total_volume': []})
+            series['Exercise'].append(exercise)
+            series['date'].append(date)
+            series['max_weight'].append(max_weight)
+            series['total_volume'].append(total_volume)
+    return results
+
+def analysis_exercise_names(athlete):
+    with sqlite3.connect(DB_PATH) as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT exercise FROM analysis_aggregates WHERE athlete = ? ORDER BY exercise", (athlete.lower(),))]
+
+def analysis_data_version(athlete):
+    """Changes whenever one of the athlete's finished files is added, edited or removed."""
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute("SELECT filename, mtime_ns, size FROM analysis_files WHERE athlete = ? ORDER BY filename",
+                            (athlete.lower(),)).fetchall()
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()
+
+def encode_analysis_columnar(results):
+    """Puts every series on one sorted epoch-day axis; each series lists its positions on it."""
+    days = sorted({epoch_day(date) for series in results.values() for date in series['date']})
+    position = {day: i for i, day in enumerate(days)}
+    return days, {exercise: {
+        'day_index': [position[epoch_day(date)] for date in series['date']],
+        'max_weight': [round(value, 2) for value in series['max_weight']],
+        'total_volume': [round(value, 2) for value in series['total_volume']],
+    } for exercise, series in results.items()}
+
+def _plain_number(value):
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+def latest_exercise_performances(username, exercise_names):
+    """Most recent logged sets for each exercise (case-insensitive), from one filtered archive read."""
+    import numpy as np
+    sets = workout_archive.read(username, exercises=exercise_names)
+    codes = {name.lower(): code for code, name in enumerate(sets['exercise_names'])}
+    history = {}
+    for name in exercise_names:
+        rows = np.flatnonzero(sets['exercise'] == codes.get(name.lower(), -1))
+        if not len(rows):
+            history[name] = None
+            continue
+        last_day = sets['day'][rows].max()
+        rows = rows[sets['day'][rows] == last_day]
+        # Two sessions of the exercise on one day: the most recently archived file wins.
+        rows = rows[sets['file_id'][rows] == sets['file_id'][rows].max()]
+        history[name] = {"date": date_from_epoch_day(last_day), "sets": [
+            {'Actual Reps': _plain_number(sets['reps'][i]), 'Actual Weight (lb)': _plain_number(sets['weight'][i])} for i in rows]}
+    return history
 
 def get_latest_exercise_performance(username, exercise_name):
-    user_files = filter_files_by_user([f for f in os.listdir(FINISHED_DIR) if f.endswith('_tracked.csv')], username)
-    def get_date_from_filename(f):
-        try: return datetime.datetime.strptime(f.split('_')[-1].replace('_tracked.csv',''), '%Y-%m-%d')
-        except: return datetime.datetime.min
-    user_files.sort(key=get_date_from_filename, reverse=True)
-    for filename in user_files:
-        try:
-            df = pd.read_csv(os.path.join(FINISHED_DIR, filename))
-            if exercise_name.lower() in df['Exercise'].str.lower().values:
-                exercise_df = df[df['Exercise'].str.lower() == exercise_name.lower()]
-                if 'Actual Reps' in exercise_df.columns and 'Actual Weight (lb)' in exercise_df.columns:
-                    exercise_df['Actual Reps'] = pd.to_numeric(exercise_df['Actual Reps'], errors='coerce').fillna(0)
-                    exercise_df['Actual Weight (lb)'] = pd.to_numeric(exercise_df['Actual Weight (lb)'], errors='coerce').fillna(0)
-                    history = exercise_df[['Actual Reps', 'Actual Weight (lb)']].to_dict('records')
-                    return {"date": get_date_from_filename(filename).strftime('%Y-%m-%d'), "sets": history}
-        except Exception as e:
-            app.logger.error(f"Error processing {filename} for history: {e}")
-    return None
+    """Looks up the athlete's most recent logged sets for an exercise (case-insensitive)."""
+    sync_analysis_store(username)
+    return latest_exercise_performances(username, [exercise_name])[exercise_name]
 
 @app.route('/api/get_exercise_history', methods=['GET'])
 @login_required
@@ -355,6 +2250,158 @@ def get_exercise_history():
     else:
         return jsonify({"status": "success", "history": None, "message": "No prior history found."})
 
+@app.route('/api/get_exercise_history_batch', methods=['POST'])
+@login_required
+def get_exercise_history_batch():
+    """Returns the last performance of every exercise in a plan in one round-trip."""
+    data = request.get_json() or {}
+    username = data.get('user')
+    exercises = data.get('exercises')
+    if not username or not isinstance(exercises, list) or not all(isinstance(name, str) for name in exercises):
+        return jsonify({"status": "error", "message": "User and a list of exercise names are required."}), 400
+    if current_user.role != 'coach' and username != current_user.username:
+        return jsonify({"status": "error", "message": "Permission denied."}), 403
+    sync_analysis_store(username)
+    history = latest_exercise_performances(username, [name for name in dict.fromkeys(exercises) if name])
+    return jsonify({"status": "success", "history": history})
+
+# --- TRAINING METRICS ---
+# Computed for the whole roster at once from the workout archive: every metric is a NumPy
+# reduction over flat per-set arrays, so the coach dashboard is one pass, not one per athlete.
+ACWR_CHRONIC_WEEKS = 4
+DASHBOARD_WEEKS = 8
+
+def epoch_day(date_text):
+    return (datetime.date.fromisoformat(date_text) - datetime.date(1970, 1, 1)).days
+
+def date_from_epoch_day(day):
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))).isoformat()
+
+def _none_if_nan(value, digits):
+    return None if value != value else round(float(value), digits)
+
+def load_set_arrays():
+    """Reads every archived set into flat arrays plus the athlete and exercise label lists they index."""
+    import numpy as np
+    athletes, exercises, exercise_codes, parts = [], [], {}, []
+    for athlete in workout_archive.athletes():
+        sets = workout_archive.read(athlete)
+        if not len(sets['day']):
+            continue
+        # Each archive has its own exercise dictionary; map its codes onto one roster-wide list.
+        for name in sets['exercise_names']:
+            if name.lower() not in exercise_codes:
+                exercise_codes[name.lower()] = len(exercises)
+                exercises.append(name)
+        to_global = np.array([exercise_codes[name.lower()] for name in sets['exercise_names']], dtype=np.int64)
+        parts.append((np.full(len(sets['day']), len(athletes), dtype=np.int64), to_global[sets['exercise']], sets))
+        athletes.append(athlete)
+
+    def concat(values, dtype):
+        return np.concatenate(list(values)).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+    return {
+        'athletes': athletes,
+        'exercises': exercises,
+        'athlete_idx': concat((p[0] for p in parts), np.int64),
+        'exercise_idx': concat((p[1] for p in parts), np.int64),
+        'day': concat((p[2]['day'] for p in parts), np.int64),
+        'reps': concat((p[2]['reps'] for p in parts), float),
+        'weight': concat((p[2]['weight'] for p in parts), float),
+        'rir': concat((p[2]['rir'] for p in parts), float),
+    }
+
+def compute_training_metrics(sets, as_of_day, weeks=DASHBOARD_WEEKS):
+    """Estimated 1RM, RIR-adjusted intensity, weekly tonnage and ACWR for every athlete in one pass.
+
+    e1RM uses Epley on reps-to-failure (reps + RIR, RIR treated as 0 when not logged). Intensity is
+    a set's weight over the athlete's best e1RM for that exercise. ACWR is each week's tonnage over
+    the mean weekly tonnage of the ACWR_CHRONIC_WEEKS weeks ending with it.
+    """
+    import numpy as np
+    n_athletes, n_exercises = len(sets['athletes']), len(sets['exercises'])
+    keep = sets['day'] <= as_of_day
+    athlete_idx, exercise_idx, day = sets['athlete_idx'][keep], sets['exercise_idx'][keep], sets['day'][keep]
+    reps, weight, rir = sets['reps'][keep], sets['weight'][keep], sets['rir'][keep]
+
+    valid = (reps > 0) & (weight > 0)
+    e1rm = np.where(valid, weight * (1 + (reps + np.nan_to_num(rir, nan=0.0).clip(min=0)) / 30), 0.0)
+    pair = athlete_idx * n_exercises + exercise_idx
+    n_pairs = n_athletes * n_exercises
+    best_e1rm = np.zeros(n_pairs)
+    np.maximum.at(best_e1rm, pair, e1rm)
+    last_day = np.full(n_pairs, -1, dtype=np.int64)
+    np.maximum.at(last_day, pair, day)
+    latest_e1rm = np.zeros(n_pairs)
+    on_last_day = day == last_day[pair]
+    np.maximum.at(latest_e1rm, pair[on_last_day], e1rm[on_last_day])
+    intensity = np.divide(weight, best_e1rm[pair], out=np.zeros_like(weight), where=valid & (best_e1rm[pair] > 0))
+    recent = valid & (day > as_of_day - 7)
+    recent_sets = np.bincount(pair[recent], minlength=n_pairs)
+    recent_intensity = np.divide(np.bincount(pair[recent], weights=intensity[recent], minlength=n_pairs), recent_sets,
+                                 out=np.full(n_pairs, np.nan), where=recent_sets > 0)
+
+    # Monday-based week numbers; history starts early enough for the first shown week's chronic load.
+    week = (day + 3) // 7
+    last_week = (as_of_day + 3) // 7
+    span = weeks + ACWR_CHRONIC_WEEKS - 1
+    first_week = last_week - span + 1
+    in_span = week >= first_week
+    tonnage = np.bincount(athlete_idx[in_span] * span + (week[in_span] - first_week),
+                          weights=(reps * weight)[in_span], minlength=n_athletes * span).astype(float).reshape(n_athletes, span)
+    running = np.cumsum(np.pad(tonnage, ((0, 0), (1, 0))), axis=1)
+    chronic = (running[:, ACWR_CHRONIC_WEEKS:] - running[:, :-ACWR_CHRONIC_WEEKS]) / ACWR_CHRONIC_WEEKS
+    acute = tonnage[:, ACWR_CHRONIC_WEEKS - 1:]
+    acwr = np.divide(acute, chronic, out=np.full_like(acute, np.nan), where=chronic > 0)
+
+    sessions = np.unique(athlete_idx * (as_of_day + 1) + day)
+    session_counts = np.bincount(sessions // (as_of_day + 1), minlength=n_athletes)
+    athlete_last_day = np.full(n_athletes, -1, dtype=np.int64)
+    np.maximum.at(athlete_last_day, athlete_idx, day)
+
+    results = []
+    for a, athlete in enumerate(sets['athletes']):
+        pairs = [a * n_exercises + e for e in range(n_exercises) if last_day[a * n_exercises + e] >= 0]
+        results.append({
+            'athlete': athlete,
+            'sessions': int(session_counts[a]),
+            'last_session': date_from_epoch_day(athlete_last_day[a]) if athlete_last_day[a] >= 0 else None,
+            'weekly_tonnage': [round(float(t), 1) for t in acute[a]],
+            'acwr': [_none_if_nan(r, 2) for r in acwr[a]],
+            'exercises': [{
+                'exercise': sets['exercises'][p % n_exercises],
+                'e1rm': round(float(best_e1rm[p]), 1),
+                'latest_e1rm': round(float(latest_e1rm[p]), 1),
+                'last_date': date_from_epoch_day(last_day[p]),
+                'recent_intensity': _none_if_nan(recent_intensity[p], 3),
+            } for p in sorted(pairs, key=lambda p: -best_e1rm[p])],
+        })
+    week_starts = [date_from_epoch_day(7 * w - 3) for w in range(last_week - weeks + 1, last_week + 1)]
+    return week_starts, results
+
+@app.route('/api/coach_dashboard', methods=['GET'])
+@coach_required
+def coach_dashboard():
+    """Roster-wide training metrics for the coach's overview."""
+    as_of = request.args.get('as_of') or datetime.date.today().isoformat()
+    try:
+        as_of_day = epoch_day(as_of)
+    except ValueError:
+        return jsonify({"status": "error", "message": "as_of must be a YYYY-MM-DD date."}), 400
+    weeks = max(1, min(request.args.get('weeks', DASHBOARD_WEEKS, type=int), 104))
+    for athlete in storage.athletes('finished'):
+        sync_analysis_store(athlete)
+    week_starts, results = compute_training_metrics(load_set_arrays(), as_of_day, weeks)
+    names = {athlete['name'].lower(): athlete['name'] for athlete in roster.athletes()}
+    for result in results:
+        result['athlete'] = names.get(result['athlete'], result['athlete'])
+    return jsonify({"status": "success", "as_of": as_of, "weeks": week_starts, "athletes": results})
+
+@app.route('/api/metrics', methods=['GET'])
+@coach_required
+def get_metrics():
+    """Request, I/O and email metrics summed over every worker, for Prometheus or a quick curl."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/save_plan', methods=['POST'])
 @login_required
 def save_plan():
@@ -362,8 +2409,7 @@ def save_plan():
     filename = data.get('filename')
     if current_user.role != 'coach' and not filename.startswith(current_user.username + '_'):
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    with open(os.path.join(PLANNED_DIR, filename), 'w', newline='', encoding='utf-8') as f:
-        f.write(data.get('csv_content'))
+    storage.write('planned', filename, data.get('csv_content'))
     app.logger.info(f"Plan '{filename}' saved for user {current_user.username}")
     return jsonify({"status": "success", "message": f"Plan '{filename}' saved."})
 
@@ -374,10 +2420,22 @@ def save_progress():
     filename = data.get('filename')
     if current_user.role != 'coach' and not filename.startswith(current_user.username + '_'):
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    with open(os.path.join(INPROGRESS_DIR, filename), 'w', newline='', encoding='utf-8') as f:
-        f.write(data.get('csv_content'))
-    app.logger.info(f"Progress saved for workout '{filename}' by user {current_user.username}")
-    return jsonify({"status": "success", "message": "Progress saved."})
+    changes = data.get('changes')
+    expected_version = parse_progress_version(data)
+    if expected_version is None:
+        return missing_version_response()
+    try:
+        if changes is None:
+            version = save_progress_snapshot(filename, data.get('csv_content'), expected_version)
+        else:
+            if not isinstance(changes, list) or not all(isinstance(c, dict) and 'exercise' in c and 'set' in c for c in changes):
+                return jsonify({"status": "error", "message": "Delta saves need a list of changes with exercise and set."}), 400
+            version = append_progress_delta(filename, expected_version, changes)
+    except StaleVersionError as e:
+        app.logger.warning(f"Rejected stale save for workout '{filename}' by user {current_user.username}")
+        return stale_version_response(e)
+    app.logger.info(f"Progress saved for workout '{filename}' by user {current_user.username} (version {version})")
+    return jsonify({"status": "success", "message": "Progress saved.", "version": version})
 
 @app.route('/api/complete_workout', methods=['POST'])
 @login_required
@@ -389,43 +2447,170 @@ def complete_workout():
 
     if current_user.role != 'coach' and not tracked_filename.startswith(current_user.username + '_'):
         return jsonify({"status": "error", "message": "Permission denied."}), 403
+    expected_version = parse_progress_version(data)
+    if expected_version is None:
+        return missing_version_response()
     
-    finished_path = os.path.join(FINISHED_DIR, tracked_filename)
-    with open(finished_path, 'w', newline='', encoding='utf-8') as f:
-        f.write(csv_content)
-    
-    plan_path = os.path.join(PLANNED_DIR, plan_filename)
-    if os.path.exists(plan_path):
-        os.remove(plan_path)
+    try:
+        csv_content = finalize_progress(plan_filename, tracked_filename, csv_content, expected_version)
+    except StaleVersionError as e:
+        return stale_version_response(e)
+    except FileNotFoundError:
+        return jsonify({"status": "error", "message": "No saved progress to complete."}), 404
 
-    inprogress_path = os.path.join(INPROGRESS_DIR, tracked_filename)
-    if os.path.exists(inprogress_path):
-        os.remove(inprogress_path)
-    
     app.logger.info(f"Workout '{tracked_filename}' completed by user {current_user.username}")
     
     athlete_name = tracked_filename.split('_')[0]
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            refresh_analysis_file(conn, athlete_name, tracked_filename)
+    except Exception as e:
+        app.logger.error(f"Could not update analysis store for '{tracked_filename}': {e}")
+
     recipient = get_athlete_email(athlete_name)
     if recipient:
         subject = f"Workout Completed: {plan_filename.replace('.csv', '').replace('_', ' ')}"
         body = f"Great work, {athlete_name}!\n\nYour workout has been completed. The full details are attached.\n\n- Dunamis Training"
-        send_email_with_python(recipient, subject, body, finished_path)
+        try:
+            enqueue_email(recipient, subject, body, tracked_filename, csv_content.encode('utf-8'))
+        except Exception as e:
+            app.logger.error(f"Could not queue workout email to {recipient}: {e}")
     else:
         app.logger.warning(f"Could not find email for athlete '{athlete_name}'. Skipping email notification.")
 
     return jsonify({"status": "success", "message": "Workout completed."})
 
+# --- EXERCISE CATALOG ---
+EXERCISE_SIMILARITY_THRESHOLD = 0.7
+EXERCISE_FUZZY_THRESHOLD = 0.3
+
+def _words(text):
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ExerciseCatalog:
+    """Per-worker copy of the stored exercise list with an ETag and a prefix/trigram search index.
+
+    The store's exercise signature is checked on each use, so an exercise added through another
+    gunicorn worker is picked up on the next request.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._signature = None
+        self.names, self.etag = [], None
+        self._tokens = []
+        self._trigram_index = {}
+        self._trigram_counts = []
+
+    def _load(self, signature):
+        names = self.store.exercises()
+        tokens, trigram_index, trigram_counts = [], {}, []
+        for i, name in enumerate(names):
+            tokens.extend((token, i) for token in _words(name))
+            grams = _trigrams(name)
+            trigram_counts.append(len(grams))
+            for gram in grams:
+                trigram_index.setdefault(gram, []).append(i)
+        tokens.sort()
+        self.names, self.etag = names, hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()[:16]
+        self._tokens, self._trigram_index, self._trigram_counts = tokens, trigram_index, trigram_counts
+        self._signature = signature
+
+    def _refresh_locked(self):
+        signature = self.store.exercises_signature()
+        if self.etag is None or signature != self._signature:
+            self._load(signature)
+
+    def refresh(self):
+        """Returns (names, etag) of one and the same version of the list."""
+        with self._lock:
+            self._refresh_locked()
+            return self.names, self.etag
+
+    @contextmanager
+    def updating(self):
+        """Yields the current names under an flock that every worker and thread takes to change the list.
+
+        flock locks separate open() calls against each other even within one process, so a
+        read-modify-write done inside never loses an exercise added concurrently by anyone else.
+        """
+        import fcntl
+        with open(EXERCISES_LOCK_PATH, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield self.refresh()[0]
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _ids_with_token_prefix(self, prefix):
+        ids = set()
+        for token, i in self._tokens[bisect.bisect_left(self._tokens, (prefix,)):]:
+            if not token.startswith(prefix):
+                break
+            ids.add(i)
+        return ids
+
+    def _similarities(self, text):
+        grams = _trigrams(text)
+        shared = {}
+        for gram in grams:
+            for i in self._trigram_index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        return {i: count / (len(grams) + self._trigram_counts[i] - count) for i, count in shared.items()}
+
+    def search(self, query, limit=10):
+        """Prefix matches on the name or its words first, then fuzzy trigram matches."""
+        query = query.strip().lower()
+        words = _words(query)
+        if not words:
+            return []
+        with self._lock:
+            self._refresh_locked()
+            matched = set.intersection(*(self._ids_with_token_prefix(word) for word in words))
+            ranked = sorted(matched, key=lambda i: (not self.names[i].lower().startswith(query), self.names[i].lower()))
+            scores = self._similarities(query)
+            ranked += sorted((i for i, score in scores.items() if score >= EXERCISE_FUZZY_THRESHOLD and i not in matched),
+                             key=lambda i: -scores[i])
+            return [self.names[i] for i in ranked[:limit]]
+
+    def similar(self, name, threshold=EXERCISE_SIMILARITY_THRESHOLD):
+        """Existing names that are probably the same exercise spelled differently."""
+        with self._lock:
+            self._refresh_locked()
+            scores = self._similarities(name)
+            return [self.names[i] for i in sorted(scores, key=lambda i: -scores[i]) if scores[i] >= threshold]
+
+exercise_catalog = ExerciseCatalog(storage)
+
 @app.route('/api/get_exercises', methods=['GET'])
 @login_required
 def get_exercises():
-    exercises_path = os.path.join(API_DIR, 'exercises.csv')
     try:
-        df = pd.read_csv(exercises_path)
-        return jsonify({"status": "success", "exercises": df['Exercise'].tolist()})
+        names, etag = exercise_catalog.refresh()
+        response = jsonify({"status": "success", "exercises": names})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         app.logger.error(f"Could not read exercises file: {e}")
         return jsonify({"status": "error", "message": "Could not read exercises."}), 500
 
+@app.route('/api/search_exercises', methods=['GET'])
+@login_required
+def search_exercises():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    try:
+        return jsonify({"status": "success", "exercises": exercise_catalog.search(query, limit)})
+    except Exception as e:
+        app.logger.error(f"Could not search exercises: {e}")
+        return jsonify({"status": "error", "message": "Could not search exercises."}), 500
+
 @app.route('/api/add_exercise', methods=['POST'])
 @coach_required
 def add_exercise():
@@ -434,15 +2619,15 @@ def add_exercise():
     if not new_exercise:
         return jsonify({"status": "error", "message": "Exercise name cannot be empty."}), 400
     
-    exercises_path = os.path.join(API_DIR, 'exercises.csv')
     try:
-        df = pd.read_csv(exercises_path) if os.path.exists(exercises_path) else pd.DataFrame(columns=['Exercise'])
-        if new_exercise.lower() in df['Exercise'].str.lower().values:
-            return jsonify({"status": "error", "message": f"Exercise '{new_exercise}' already exists."}), 409
-        
-        new_df = pd.concat([df, pd.DataFrame([{'Exercise': new_exercise}])], ignore_index=True)
-        new_df.sort_values('Exercise', inplace=True)
-        new_df.to_csv(exercises_path, index=False)
+        with exercise_catalog.updating() as exercises:
+            if new_exercise.lower() in {name.lower() for name in exercises}:
+                return jsonify({"status": "error", "message": f"Exercise '{new_exercise}' already exists."}), 409
+            similar = exercise_catalog.similar(new_exercise) if exercises else []
+            if similar and not data.get('allow_similar'):
+                return jsonify({"status": "error", "message": f"Similar exercise already exists: {', '.join(similar)}.", "similar": similar}), 409
+
+            storage.save_exercises(sorted(exercises + [new_exercise]))
         app.logger.info(f"New exercise '{new_exercise}' added by {current_user.username}")
         return jsonify({"status": "success", "message": f"Exercise '{new_exercise}' added."}), 201
     except Exception as e:
@@ -455,10 +2640,16 @@ def get_workout_file():
     filename, file_type = request.args.get('filename'), request.args.get('type')
     if current_user.role != 'coach' and not filename.startswith(current_user.username + '_'):
         return jsonify({"status": "error", "message": "Permission denied."}), 403
-    dir_map = {'plan': PLANNED_DIR, 'tracked': INPROGRESS_DIR, 'finished': FINISHED_DIR}
-    if not dir_map.get(file_type): return jsonify({"status": "error", "message": "Invalid request type."}), 400
+    state = {'plan': 'planned', 'tracked': 'inprogress', 'finished': 'finished'}.get(file_type)
+    if not state: return jsonify({"status": "error", "message": "Invalid request type."}), 400
     try:
-        return send_from_directory(dir_map.get(file_type), filename, as_attachment=True)
+        if state == 'inprogress':
+            compact_progress(filename)
+        response = send_file(io.BytesIO(storage.read(state, filename).encode('utf-8')), mimetype='text/csv',
+                             as_attachment=True, download_name=filename)
+        if state == 'inprogress':
+            response.headers['X-Workout-Version'] = str(get_progress_version(filename))
+        return response
     except FileNotFoundError:
         return jsonify({"status": "error", "message": "File not found."}), 404
 
@@ -469,7 +2660,7 @@ def list_templates():
     if current_user.role != 'coach' and username_to_view != current_user.username:
         return jsonify({"status": "error", "message": "Permission denied."}), 403
     
-    finished_files = filter_files_by_user([f for f in os.listdir(FINISHED_DIR) if f.endswith('_tracked.csv')], username_to_view)
+    finished_files = storage.files('finished', username_to_view)
     
     templates = [{'filename': f, 'type': 'finished'} for f in finished_files]
     templates.sort(key=lambda x: x['filename'], reverse=True)
@@ -483,13 +2674,412 @@ def delete_plan():
     if current_user.role != 'coach' and not filename.startswith(current_user.username + '_'):
         return jsonify({"status": "error", "message": "Permission denied."}), 403
         
-    file_path = os.path.join(PLANNED_DIR, filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    if storage.remove('planned', filename):
         app.logger.info(f"Plan '{filename}' deleted by {current_user.username}")
         return jsonify({"status": "success", "message": f"Plan '{filename}' deleted."})
     return jsonify({"status": "error", "message": "Plan not found."}), 404
 
+# --- MESOCYCLE SCHEDULING ---
+# One request turns a template workout into planned sessions for several athletes and dates.
+# Loads progress by week: week n of the block (counted from its first date) gets
+# weight * (1 + amount/100)^n for 'percent' or weight + amount * n for 'fixed'.
+PLAN_HEADER = ["Exercise", "Set", "Target Reps", "Target Weight (lb)", "Superset Group",
+               "Coach's Notes", "Actual Reps", "Actual Weight (lb)", "RIR", "Athlete Notes"]
+SCHEDULE_TEMPLATE_STATES = {'plan': 'planned', 'finished': 'finished'}
+SCHEDULE_MAX_SESSIONS = 500
+
+def load_schedule_template(template_type, filename):
+    """Reads a plan or finished workout into [{exercise, set, reps, weight, superset, notes}, ...].
+
+    Finished templates start from the weight actually lifted on each set, falling back to the target.
+    """
+    csv_text = storage.read(SCHEDULE_TEMPLATE_STATES[template_type], filename)
+    count_io('csv_parse')
+    rows = list(csv.DictReader(io.StringIO(csv_text, newline='')))
+    sets = []
+    for row in rows:
+        exercise = (row.get('Exercise') or '').strip()
+        if not exercise:
+            continue
+        weight = (row.get('Target Weight (lb)') or '').strip()
+        if template_type == 'finished' and (row.get('Actual Weight (lb)') or '').strip():
+            weight = row['Actual Weight (lb)'].strip()
+        sets.append({
+            'exercise': exercise,
+            'set': (row.get('Set') or '').strip(),
+            'reps': (row.get('Target Reps') or '').strip(),
+            'weight': weight,
+            'superset': (row.get('Superset Group') or 'None').strip() or 'None',
+            'notes': (row.get("Coach's Notes") or row.get('Notes') or '').strip(),
+        })
+    return sets
+
+def progress_weight(weight, week, progression):
+    """Applies the progression rule to one target weight; non-numeric targets (e.g. 'BW', 'inf') pass through."""
+    try:
+        value = float(weight)
+    except ValueError:
+        return weight
+    if not math.isfinite(value):
+        return weight
+    amount, round_to = progression['amount'], progression.get('round_to')
+    try:
+        value = value * (1 + amount / 100) ** week if progression['type'] == 'percent' else value + amount * week
+        value = round(value / round_to) * round_to if round_to else round(value, 2)
+    except OverflowError:
+        return weight
+    if not math.isfinite(value):
+        return weight
+    return _plain_number(max(value, 0.0))
+
+def render_scheduled_plan(template_sets, week, progression):
+    reps_by_week = progression.get('reps_by_week') or []
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(PLAN_HEADER)
+    for s in template_sets:
+        reps = reps_by_week[min(week, len(reps_by_week) - 1)] if reps_by_week else s['reps']
+        writer.writerow([s['exercise'], s['set'], reps, progress_weight(s['weight'], week, progression),
+                         s['superset'], s['notes'], '', '', '', ''])
+    return out.getvalue()
+
+def parse_schedule_request(data):
+    """Validates a schedule_mesocycle body. Returns (template_sets, sessions, progression) or raises ValueError."""
+    template = data.get('template') or {}
+    template_type, template_file = template.get('type'), template.get('filename') or ''
+    if template_type not in SCHEDULE_TEMPLATE_STATES:
+        raise ValueError("Template type must be 'plan' or 'finished'.")
+    if not template_file or os.path.basename(template_file) != template_file:
+        raise ValueError("A template filename is required.")
+    try:
+        template_sets = load_schedule_template(template_type, template_file)
+    except FileNotFoundError:
+        raise ValueError(f"Template '{template_file}' not found.")
+    if not template_sets:
+        raise ValueError(f"Template '{template_file}' has no exercises.")
+
+    progression = dict(data.get('progression') or {'type': 'fixed', 'amount': 0})
+    if progression.get('type') not in ('percent', 'fixed'):
+        raise ValueError("Progression type must be 'percent' or 'fixed'.")
+    try:
+        progression['amount'] = float(progression.get('amount', 0))
+        progression['round_to'] = float(progression['round_to']) if progression.get('round_to') else None
+    except (TypeError, ValueError):
+        raise ValueError("Progression amount and round_to must be numbers.")
+    if not math.isfinite(progression['amount']) or not math.isfinite(progression['round_to'] or 0):
+        raise ValueError("Progression amount and round_to must be finite numbers.")
+    if progression['round_to'] is not None and progression['round_to'] <= 0:
+        raise ValueError("Progression round_to must be positive.")
+    reps_by_week = progression.get('reps_by_week') or []
+    if not isinstance(reps_by_week, list) or not all(isinstance(r, (str, int)) and str(r).strip() for r in reps_by_week):
+        raise ValueError("Progression reps_by_week must be a list of rep targets, one per week.")
+    progression['reps_by_week'] = [str(r).strip() for r in reps_by_week]
+
+    known = {a['name'].lower(): a['name'] for a in roster.athletes()}
+    athletes = data.get('athletes') or []
+    if not isinstance(athletes, list) or not athletes:
+        raise ValueError("At least one athlete is required.")
+    unknown = [a for a in athletes if str(a).lower() not in known]
+    if unknown:
+        raise ValueError(f"Unknown athlete(s): {', '.join(map(str, unknown))}.")
+    try:
+        dates = sorted({datetime.date.fromisoformat(d) for d in data.get('dates') or []})
+    except (TypeError, ValueError):
+        raise ValueError("Dates must be YYYY-MM-DD.")
+    if not dates:
+        raise ValueError("At least one date is required.")
+    if len(dates) * len(athletes) > SCHEDULE_MAX_SESSIONS:
+        raise ValueError(f"A block can schedule at most {SCHEDULE_MAX_SESSIONS} sessions per request.")
+
+    name = str(data.get('workout_name') or '_'.join(template_file.replace('_tracked.csv', '').replace('.csv', '').split('_')[1:-1]))
+    name = name.strip().replace(' ', '_')
+    if not name or not all(c.isalnum() or c in '_-' for c in name):
+        raise ValueError("Workout name may only use letters, numbers, spaces, '-' and '_'.")
+    sessions = [(known[str(a).lower()], f"{known[str(a).lower()]}_{name}_{d.isoformat()}.csv", (d - dates[0]).days // 7)
+                for a in athletes for d in dates]
+    return template_sets, sessions, progression
+
+@app.route('/api/schedule_mesocycle', methods=['POST'])
+@coach_required
+def schedule_mesocycle():
+    """Writes every planned session of a training block from one template in a single request.
+
+    Body: {"template": {"type": "plan"|"finished", "filename": ...}, "athletes": [...], "dates": [...],
+    "workout_name": optional, "overwrite": false,
+    "progression": {"type": "percent"|"fixed", "amount": per week, "round_to": optional, "reps_by_week": optional}}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        template_sets, sessions, progression = parse_schedule_request(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    existing = {f for athlete in {s[0] for s in sessions} for f in storage.files('planned', athlete)}
+    clashes = [filename for _, filename, _ in sessions if filename in existing]
+    if clashes and not data.get('overwrite'):
+        return jsonify({"status": "error", "message": "Some sessions are already planned; pass overwrite to replace them.",
+                        "existing": clashes}), 409
+
+    by_week = {week: render_scheduled_plan(template_sets, week, progression) for week in {s[2] for s in sessions}}
+    files = {filename: by_week[week] for _, filename, week in sessions}
+    storage.write_many('planned', files)
+    app.logger.info(f"Scheduled {len(files)} planned sessions from '{data['template']['filename']}' by {current_user.username}")
+    return jsonify({"status": "success", "message": f"Scheduled {len(files)} sessions.",
+                    "plans": [{'athlete': athlete, 'filename': filename, 'week': week} for athlete, filename, week in sessions]})
+
+# --- EXPORT AND IMPORT ---
+# Archives mirror the file storage layout whichever backend is in use: planned_workouts/,
+# inprogress_workouts/ and finished_workouts/ hold the workout CSVs as stored, api/emails.csv the
+# roster (the legacy Athlete,Email format) and api/exercises.csv the catalog, plus a manifest.json.
+TRANSFER_CHUNK_SIZE = 64 * 1024
+IMPORT_MAX_FILE_BYTES = 5 * 1024 * 1024
+WORKOUT_ARCHIVE_DIRS = {'planned_workouts': 'planned', 'inprogress_workouts': 'inprogress', 'finished_workouts': 'finished'}
+
+class ImportValidationError(Exception):
+    def __init__(self, problems):
+        super().__init__('; '.join(problems))
+        self.problems = problems
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target whose contents the export generator hands out as it goes."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+def _export_files(athlete):
+    """(archive name, state, filename) of every workout for the athlete, or for everyone when athlete is None."""
+    for directory_name, state in WORKOUT_ARCHIVE_DIRS.items():
+        for name in [athlete] if athlete else storage.athletes(state):
+            for filename in storage.files(state, name):
+                if state == 'inprogress':
+                    compact_progress(filename)
+                yield f'{directory_name}/{filename}', state, filename
+
+def stream_export(athlete, archive_format):
+    """Yields a zip or tar.gz of the athlete's (or everyone's) data one file at a time."""
+    import tarfile
+    import zipfile
+    sink = _ChunkSink()
+    if archive_format == 'zip':
+        archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+    else:
+        archive = tarfile.open(fileobj=sink, mode='w|gz')
+
+    def add(name, source, size, mtime):
+        if archive_format == 'zip':
+            info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as dest:
+                while chunk := source.read(TRANSFER_CHUNK_SIZE):
+                    dest.write(chunk)
+                    yield sink.drain()
+        else:
+            info = tarfile.TarInfo(name)
+            info.size, info.mtime = size, mtime
+            archive.addfile(info, source)
+        yield sink.drain()
+
+    counts = {state: 0 for state in WORKOUT_ARCHIVE_DIRS.values()}
+    for name, state, filename in _export_files(athlete):
+        signature = storage.stat(state, filename)
+        try:
+            data = storage.read(state, filename).encode('utf-8')
+        except FileNotFoundError:
+            continue
+        yield from add(name, io.BytesIO(data), len(data), signature[0] / 1e9 if signature else time.time())
+        counts[state] += 1
+    roster_csv = io.StringIO()
+    writer = csv.writer(roster_csv, lineterminator='\n')
+    writer.writerow(['Athlete', 'Email'])
+    athletes = [a for a in roster.athletes() if athlete is None or a['name'].lower() == athlete.lower()]
+    writer.writerows([a['name'], a['email']] for a in athletes)
+    extras = [('api/emails.csv', roster_csv.getvalue().encode('utf-8'))]
+    if storage.exercises_signature() is not None:
+        extras.append(('api/exercises.csv', exercises_csv(exercise_catalog.refresh()[0]).encode('utf-8')))
+    manifest = {'format': 1, 'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'athlete': athlete, 'athletes': len(athletes), 'files': counts}
+    extras.append(('manifest.json', json.dumps(manifest, indent=2).encode('utf-8')))
+    for name, data in extras:
+        yield from add(name, io.BytesIO(data), len(data), time.time())
+    archive.close()
+    yield sink.drain()
+
+def _archive_members(stream):
+    """Yields (name, readable or None for non-regular entries) from an uploaded zip or tar(.gz)."""
+    import tarfile
+    import zipfile
+    if zipfile.is_zipfile(stream):
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, member
+        return
+    stream.seek(0)
+    try:
+        archive = tarfile.open(fileobj=stream, mode='r|*')
+    except tarfile.ReadError:
+        raise ImportValidationError(['The upload is not a zip or tar archive.'])
+    with archive:
+        for info in archive:
+            if info.isfile():
+                yield info.name, archive.extractfile(info)
+            elif not info.isdir():
+                yield info.name, None
+
+def _import_target(name):
+    """Maps an archive entry to its destination key, or None when it has no place in the data directory."""
+    if name.startswith('./'):
+        name = name[2:]
+    if name in ('manifest.json', 'api/emails.csv', 'api/exercises.csv'):
+        return name
+    directory, _, filename = name.partition('/')
+    state = WORKOUT_ARCHIVE_DIRS.get(directory)
+    if (state is None or not filename or '/' in filename or '\\' in filename or filename.startswith('.')
+            or '_' not in filename or not filename.endswith(WORKOUT_SUFFIXES[state])):
+        return None
+    return (state, filename)
+
+def _stage_import_file(name, source, path):
+    written = 0
+    with open(path, 'wb') as dest:
+        while chunk := source.read(TRANSFER_CHUNK_SIZE):
+            written += len(chunk)
+            if written > IMPORT_MAX_FILE_BYTES:
+                raise ImportValidationError([f"{name} is larger than {IMPORT_MAX_FILE_BYTES // (1024 * 1024)} MB."])
+            dest.write(chunk)
+
+def _validate_import_file(name, target, path):
+    """Returns a problem description, or None when the staged file parses with the columns it needs."""
+    required = {'api/emails.csv': ('Athlete', 'Email'), 'api/exercises.csv': ('Exercise',)}.get(target, ('Exercise', 'Set'))
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            for _ in reader:
+                pass
+    except (UnicodeDecodeError, csv.Error) as e:
+        return f"{name} is not a readable CSV file ({e})."
+    missing = [column for column in required if column not in header]
+    if missing:
+        return f"{name} is missing the column(s) {', '.join(missing)}."
+    return None
+
+def import_archive(stream):
+    """Validates every entry of an uploaded archive, then applies all of it or none of it.
+
+    Workout files replace same-named files and are otherwise added; roster entries and exercises
+    are merged into the existing ones. Returns counts of what was imported.
+    """
+    staging = tempfile.mkdtemp(prefix='.import-', dir=DATA_DIR)
+    try:
+        staged, problems = {}, []
+        for name, source in _archive_members(stream):
+            target = _import_target(name)
+            if target is None or source is None:
+                problems.append(f"Unexpected archive entry: {name}")
+                continue
+            if target == 'manifest.json':
+                continue
+            path = os.path.join(staging, str(len(staged)))
+            _stage_import_file(name, source, path)
+            problem = _validate_import_file(name, target, path)
+            if problem:
+                problems.append(problem)
+            staged[target] = path
+        if problems:
+            raise ImportValidationError(problems)
+        if not staged:
+            raise ImportValidationError(['The archive contains no workouts, roster or exercises.'])
+        with exercise_catalog.updating() as existing:
+            return _apply_import(staged, existing)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def _apply_import(staged, existing):
+    counts = {state: 0 for state in WORKOUT_ARCHIVE_DIRS.values()}
+    workouts = {}
+    for target, path in staged.items():
+        if isinstance(target, tuple):
+            with open(path, newline='', encoding='utf-8') as f:
+                workouts[target] = f.read()
+    exercises = None
+    if 'api/exercises.csv' in staged:
+        known = {name.lower() for name in existing}
+        with open(staged['api/exercises.csv'], newline='', encoding='utf-8') as f:
+            added = list(dict.fromkeys(row['Exercise'].strip() for row in csv.DictReader(f)
+                                       if (row.get('Exercise') or '').strip() and row['Exercise'].strip().lower() not in known))
+        exercises = sorted(existing + added)
+        counts['exercises'] = len(added)
+    with immediate_transaction() as conn:
+        if 'api/emails.csv' in staged:
+            imported = [(name, email) for name, email in read_roster_csv(staged['api/emails.csv']) if email]
+            merged = {row['name'].lower(): (row['name'], row['email']) for row in conn.execute("SELECT name, email FROM athletes")}
+            merged.update((name.lower(), (name, email)) for name, email in imported)
+            apply_roster(conn, list(merged.values()))
+            counts['athletes'] = len(imported)
+        # Open tracker tabs must reload an in-progress file the import replaced, and the next
+        # note search re-reads every imported workout.
+        for target in staged:
+            if isinstance(target, tuple):
+                forget_workout_notes(conn, target[1])
+            if isinstance(target, tuple) and target[0] == 'inprogress':
+                conn.execute("DELETE FROM progress_journal WHERE filename = ?", (target[1],))
+                conn.execute('''
+                    INSERT INTO progress_sessions (filename, version) VALUES (?, 1)
+                    ON CONFLICT(filename) DO UPDATE SET version = version + 1
+                ''', (target[1],))
+        storage.replace(workouts, exercises)
+    for target in staged:
+        if isinstance(target, tuple):
+            counts[target[0]] += 1
+    return counts
+
+@app.route('/api/export', methods=['GET'])
+@coach_required
+def export_data():
+    """Streams ?athlete=<name> (default: everyone) as format=zip (default) or tar.gz."""
+    athlete = request.args.get('athlete') or None
+    archive_format = request.args.get('format', 'zip')
+    if archive_format not in ('zip', 'tar.gz'):
+        return jsonify({"status": "error", "message": "format must be zip or tar.gz."}), 400
+    label = re.sub(r'[^A-Za-z0-9.-]', '', athlete or 'all') or 'athlete'
+    response = app.response_class(stream_with_context(stream_export(athlete, archive_format)),
+                                  mimetype='application/zip' if archive_format == 'zip' else 'application/gzip')
+    response.headers['Content-Disposition'] = f'attachment; filename="dunamis_{label}_{datetime.date.today().isoformat()}.{archive_format}"'
+    app.logger.info(f"Export of {athlete or 'all athletes'} ({archive_format}) started by {current_user.username}")
+    return response
+
+@app.route('/api/import', methods=['POST'])
+@coach_required
+def import_data():
+    """Loads an archive made by /api/export (multipart field 'archive'); nothing is changed if any entry is invalid."""
+    upload = request.files.get('archive')
+    if upload is None:
+        return jsonify({"status": "error", "message": "Upload the archive in the 'archive' field."}), 400
+    try:
+        counts = import_archive(upload.stream)
+    except ImportValidationError as e:
+        return jsonify({"status": "error", "message": "The archive was not imported.", "problems": e.problems[:50]}), 400
+    except Exception as e:
+        app.logger.error(f"Import failed: {e}")
+        return jsonify({"status": "error", "message": "The archive could not be imported."}), 500
+    app.logger.info(f"Import by {current_user.username}: {counts}")
+    return jsonify({"status": "success", "imported": counts})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
 
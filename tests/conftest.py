@@ -0,0 +1,37 @@
+"""Runs the server against a throwaway data directory; DUNAMIS_DATA_DIR is read when server is imported."""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix='dunamis_test_')
+os.environ['DUNAMIS_DATA_DIR'] = DATA_DIR
+os.environ.pop('EMAIL_USER', None)
+os.environ.pop('EMAIL_PASS', None)
+sys.path.insert(0, REPO_DIR)
+
+COACH_PASSWORD = 'get$trong@dunamis'
+PLAN_CSV = ('"Exercise","Set","Target Reps","Target Weight (lb)","Superset Group","Coach\'s Notes","Actual Reps","Actual Weight (lb)","RIR","Athlete Notes"\n'
+            '"Back Squat","1","5","185","None","Brace hard","","","",""\n'
+            '"Back Squat","2","5","185","None","Brace hard","","","",""\n')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def server():
+    import server
+    server.app.logger.setLevel('WARNING')
+    return server
+
+
+@pytest.fixture
+def coach(server):
+    client = server.app.test_client()
+    client.post('/login', data={'username': 'coach', 'password': COACH_PASSWORD})
+    return client
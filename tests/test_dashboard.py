@@ -0,0 +1,14 @@
+def test_bad_as_of_is_a_client_error(coach):
+    response = coach.get('/api/coach_dashboard', query_string={'as_of': '2025-13-01'})
+    assert response.status_code == 400
+
+
+def test_metric_errors_are_not_reported_as_bad_dates(server, coach, monkeypatch):
+    def broken(*args):
+        raise ValueError('operands could not be broadcast together')
+    monkeypatch.setattr(server, 'compute_training_metrics', broken)
+    server.app.config['PROPAGATE_EXCEPTIONS'] = False
+    try:
+        assert coach.get('/api/coach_dashboard', query_string={'as_of': '2025-09-01'}).status_code == 500
+    finally:
+        server.app.config['PROPAGATE_EXCEPTIONS'] = None
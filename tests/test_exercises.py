@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import COACH_PASSWORD
+
+
+def test_etag_follows_the_returned_list(coach):
+    first = coach.get('/api/get_exercises')
+    etag = first.headers['ETag']
+    assert coach.get('/api/get_exercises', headers={'If-None-Match': etag}).status_code == 304
+    assert coach.post('/api/add_exercise', json={'exercise': 'Landmine Press'}).status_code == 201
+    second = coach.get('/api/get_exercises', headers={'If-None-Match': etag})
+    assert second.status_code == 200 and 'Landmine Press' in second.get_json()['exercises']
+    assert second.headers['ETag'] != etag
+
+
+def test_concurrent_additions_are_all_kept(server, coach, monkeypatch):
+    save_exercises = server.storage.save_exercises
+
+    def slow_save(names):
+        time.sleep(0.05)
+        save_exercises(names)
+
+    monkeypatch.setattr(server.storage, 'save_exercises', slow_save)
+    names = [f'Concurrent Lift {letter}' for letter in 'ABCDEF']
+
+    def add(name):
+        client = server.app.test_client()
+        client.post('/login', data={'username': 'coach', 'password': COACH_PASSWORD})
+        return client.post('/api/add_exercise', json={'exercise': name, 'allow_similar': True}).status_code
+
+    with ThreadPoolExecutor(len(names)) as pool:
+        assert list(pool.map(add, names)) == [201] * len(names)
+    assert set(names) <= set(coach.get('/api/get_exercises').get_json()['exercises'])
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.mark.parametrize('exercises', [[1, 'Back Squat'], [{'a': 1}], [None], 'Back Squat'])
+def test_batch_history_needs_a_list_of_names(coach, exercises):
+    response = coach.post('/api/get_exercise_history_batch', json={'user': 'Cal', 'exercises': exercises})
+    assert response.status_code == 400
+
+
+def test_batch_history_of_unknown_exercises_is_empty(coach):
+    response = coach.post('/api/get_exercise_history_batch', json={'user': 'Cal', 'exercises': ['Back Squat', '', 'Back Squat']})
+    assert response.status_code == 200 and response.get_json()['status'] == 'success'
@@ -0,0 +1,63 @@
+import io
+import zipfile
+
+from conftest import PLAN_CSV
+
+ROSTER_CSV = 'Athlete,Email\nImported,imported@example.com\n'
+
+
+def archive(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for name, content in entries.items():
+            z.writestr(name, content)
+    return buffer.getvalue()
+
+
+def upload(client, entries):
+    return client.post('/api/import', content_type='multipart/form-data',
+                       data={'archive': (io.BytesIO(archive(entries)), 'import.zip')})
+
+
+def athletes(client):
+    return {a['name'] for a in client.get('/api/get_athletes').get_json()['athletes']}
+
+
+def test_invalid_entries_reject_the_whole_archive(server, coach):
+    response = upload(coach, {
+        'planned_workouts/Dee_Push_2030-03-01.csv': PLAN_CSV,
+        'planned_workouts/Dee_Pull_2030-03-02.csv': 'Exercise,Reps\nRow,8\n',
+        'notes/readme.txt': 'hello',
+        'api/emails.csv': ROSTER_CSV,
+    })
+    assert response.status_code == 400
+    problems = response.get_json()['problems']
+    assert any('Dee_Pull_2030-03-02.csv is missing the column(s) Set' in p for p in problems)
+    assert 'Unexpected archive entry: notes/readme.txt' in problems
+    assert not server.storage.exists('planned', 'Dee_Push_2030-03-01.csv')
+    assert 'Imported' not in athletes(coach)
+
+
+def test_failed_write_restores_replaced_workouts(server, coach, monkeypatch):
+    original = PLAN_CSV.replace('185', '135')
+    coach.post('/api/save_plan', json={'filename': 'Dee_Legs_2030-03-03.csv', 'csv_content': original})
+    writes = []
+    count_io = server.count_io
+
+    def fail_second_write(kind, count=1):
+        if kind == 'file_write':
+            writes.append(kind)
+            if len(writes) == 2:
+                raise OSError('disk full')
+        count_io(kind, count)
+
+    monkeypatch.setattr(server, 'count_io', fail_second_write)
+    response = upload(coach, {
+        'planned_workouts/Dee_Legs_2030-03-03.csv': PLAN_CSV,
+        'planned_workouts/Dee_Arms_2030-03-04.csv': PLAN_CSV,
+        'api/emails.csv': ROSTER_CSV,
+    })
+    assert response.status_code == 500
+    assert server.storage.read('planned', 'Dee_Legs_2030-03-03.csv') == original
+    assert not server.storage.exists('planned', 'Dee_Arms_2030-03-04.csv')
+    assert 'Imported' not in athletes(coach)
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+
+def _failing_view():
+    raise RuntimeError('boom')
+
+
+def _server_errors(server):
+    return sum(value for (name, labels), value in server.metrics._pending.items()
+               if name == 'dunamis_http_requests_total' and '/api/get_exercises' in labels and 'status="500"' in labels)
+
+
+@pytest.mark.parametrize('propagate', [False, True])
+def test_unhandled_exceptions_are_counted_as_500(server, coach, monkeypatch, propagate):
+    server.metrics.flush()
+    monkeypatch.setitem(server.app.view_functions, 'get_exercises', _failing_view)
+    monkeypatch.setitem(server.app.config, 'PROPAGATE_EXCEPTIONS', propagate)
+    if propagate:
+        with pytest.raises(RuntimeError):
+            coach.get('/api/get_exercises')
+    else:
+        assert coach.get('/api/get_exercises').status_code == 500
+    assert _server_errors(server) == 1
+
+
+def test_exit_flush_is_skipped_without_a_data_directory(server, monkeypatch, caplog):
+    server.metrics.add('dunamis_emails_total', result='sent')
+    monkeypatch.setattr(server, 'DB_PATH', os.path.join(server.DATA_DIR, 'gone', 'users.db'))
+    server.metrics.flush_at_exit()
+    assert 'Could not flush' not in caplog.text
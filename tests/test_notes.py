@@ -0,0 +1,31 @@
+from conftest import PLAN_CSV
+
+
+def finished_with_note(note):
+    return PLAN_CSV.replace('"Brace hard"', f'"{note}"')
+
+
+def search(client, words):
+    return [r['note'] for r in client.get('/api/search_notes', query_string={'q': words, 'athlete': 'Eli'}).get_json()['results']]
+
+
+def test_search_picks_up_files_edited_outside_the_app(server, coach, monkeypatch):
+    server.storage.write('finished', 'Eli_Squat_2030-04-01_tracked.csv', finished_with_note('Knee caved on rep four'))
+    assert search(coach, 'knee') == ['Knee caved on rep four']
+    server.storage.write('finished', 'Eli_Squat_2030-04-01_tracked.csv', finished_with_note('Elbow sore, stopped early'))
+    monkeypatch.setattr(server, 'NOTES_RESCAN_INTERVAL', 0)
+    assert search(coach, 'knee') == []
+    assert search(coach, 'elbow') == ['Elbow sore, stopped early']
+
+
+def test_search_between_rescans_does_not_stat_every_file(server, coach, monkeypatch):
+    search(coach, 'grip')
+
+    def no_signatures(state, athlete):
+        raise AssertionError('signatures read outside a rescan')
+
+    monkeypatch.setattr(server.storage, 'signatures', no_signatures)
+    server.storage.write('finished', 'Eli_Bench_2030-04-02_tracked.csv', finished_with_note('Grip slipped'))
+    assert search(coach, 'grip') == ['Grip slipped']
+    server.storage.remove('finished', 'Eli_Bench_2030-04-02_tracked.csv')
+    assert search(coach, 'grip') == []
@@ -0,0 +1,139 @@
+import socketserver
+import sqlite3
+import threading
+import time
+
+import pytest
+
+
+def test_purge_deletes_only_old_sent_emails(server):
+    now = time.time()
+    with sqlite3.connect(server.DB_PATH) as conn:
+        ids = [conn.execute(
+            "INSERT INTO email_outbox (recipient, subject, body, status, created_at, next_attempt_at, sent_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ('a@example.com', 'Workout', 'Body', status, now, now, sent_at)
+        ).lastrowid for status, sent_at in (('sent', now - server.OUTBOX_SENT_RETENTION - 60), ('sent', now), ('failed', None))]
+    assert server.purge_sent_outbox() == 1
+    with sqlite3.connect(server.DB_PATH) as conn:
+        left = {row[0] for row in conn.execute("SELECT id FROM email_outbox")}
+    assert ids[0] not in left and {ids[1], ids[2]} <= left
+
+
+def test_drain_without_credentials_reports_once(server, monkeypatch):
+    errors = []
+    monkeypatch.setattr(server.app.logger, 'error', errors.append)
+    sender = server.OutboxSender()
+    assert sender.drain() == 0 and sender.drain() == 0
+    assert len(errors) == 1
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """A local SMTP server that accepts any login and records each message's recipients.
+
+    MAIL FROM is answered with a temporary failure while refusals is above zero.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, refusals=0):
+        super().__init__(('127.0.0.1', 0), SmtpStandInHandler)
+        self.refusals, self.connections, self.delivered = refusals, 0, []
+
+
+class SmtpStandInHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stand-in ESMTP')
+        recipients, data = [], None
+        for raw in self.rfile:
+            line = raw.decode().rstrip('\r\n')
+            if data is not None:
+                if line == '.':
+                    self.server.delivered.extend(recipients)
+                    recipients, data = [], None
+                    self.reply('250 OK')
+                continue
+            verb = line[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL' and self.server.refusals:
+                self.server.refusals -= 1
+                self.reply('451 Try again later')
+            elif verb == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip('<> '))
+                self.reply('250 OK')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                data = []
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+@pytest.fixture
+def smtp_stand_in(server, monkeypatch):
+    stand_in = SmtpStandIn()
+    threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+    for name, value in (('EMAIL_USER', 'coach@example.com'), ('EMAIL_PASS', 'secret'), ('EMAIL_SERVER', '127.0.0.1'),
+                        ('EMAIL_PORT', str(stand_in.server_address[1])), ('EMAIL_USE_TLS', '0')):
+        monkeypatch.setenv(name, value)
+    # Keep the worker's own sender thread from draining the rows these tests enqueue.
+    monkeypatch.setattr(server.outbox_sender, 'drain', lambda: 0)
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+
+
+def outbox_row(server, recipient):
+    with sqlite3.connect(server.DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        return conn.execute("SELECT * FROM email_outbox WHERE recipient = ?", (recipient,)).fetchone()
+
+
+def test_batch_is_sent_over_one_connection(server, smtp_stand_in):
+    recipients = [f'athlete{i}@example.com' for i in range(3)]
+    for recipient in recipients:
+        server.enqueue_email(recipient, 'Workout Completed', 'Great work!', 'w.csv', b'Exercise,Set\n')
+    sender = server.OutboxSender()
+    try:
+        assert sender.drain() >= len(recipients)
+    finally:
+        sender._disconnect()
+    assert smtp_stand_in.connections == 1
+    assert set(recipients) <= set(smtp_stand_in.delivered)
+    assert all(outbox_row(server, r)['status'] == 'sent' for r in recipients)
+
+
+def test_refused_message_backs_off_and_is_retried(server, smtp_stand_in):
+    recipient = 'retry@example.com'
+    smtp_stand_in.refusals = 2
+    server.enqueue_email(recipient, 'Workout Completed', 'Great work!', None, None)
+    sender = server.OutboxSender()
+    try:
+        for attempt in (1, 2):
+            started = time.time()
+            sender.drain()
+            row = outbox_row(server, recipient)
+            delay = server.OUTBOX_RETRY_BASE * 2 ** (attempt - 1)
+            assert row['status'] == 'pending' and row['attempts'] == attempt
+            assert started + delay <= row['next_attempt_at'] <= time.time() + delay
+            with sqlite3.connect(server.DB_PATH) as conn:
+                conn.execute("UPDATE email_outbox SET next_attempt_at = 0 WHERE id = ?", (row['id'],))
+        sender.drain()
+    finally:
+        sender._disconnect()
+    assert outbox_row(server, recipient)['status'] == 'sent'
+    assert smtp_stand_in.delivered.count(recipient) == 1
@@ -0,0 +1,71 @@
+import sqlite3
+
+from conftest import PLAN_CSV
+
+
+def save(client, filename, **body):
+    return client.post('/api/save_progress', json={'filename': filename, **body})
+
+
+def test_second_device_starting_same_plan_is_rejected(coach):
+    first = save(coach, 'Cal_Push_2030-02-01_tracked.csv', csv_content=PLAN_CSV, version=0)
+    assert first.status_code == 200 and first.get_json()['version'] == 1
+    second = save(coach, 'Cal_Push_2030-02-01_tracked.csv', csv_content=PLAN_CSV, version=0)
+    assert second.status_code == 409 and second.get_json()['version'] == 1
+
+
+def test_stale_delta_is_rejected_and_current_one_applied(coach):
+    filename = 'Cal_Pull_2030-02-02_tracked.csv'
+    save(coach, filename, csv_content=PLAN_CSV, version=0)
+    change = [{'exercise': 'Back Squat', 'set': '1', 'actual_reps': 5}]
+    assert save(coach, filename, version=1, changes=change).get_json()['version'] == 2
+    assert save(coach, filename, version=1, changes=change).status_code == 409
+    response = coach.get('/api/get_workout', query_string={'type': 'tracked', 'filename': filename})
+    assert response.headers['X-Workout-Version'] == '2'
+    assert '"Back Squat","1","5","185","None","Brace hard","5"' in response.get_data(as_text=True)
+
+
+def test_saves_and_completion_need_a_version(coach):
+    assert save(coach, 'Cal_Legs_2030-02-03_tracked.csv', csv_content=PLAN_CSV).status_code == 400
+    response = coach.post('/api/complete_workout', json={'plan_filename': 'Cal_Legs_2030-02-03.csv',
+                                                         'tracked_filename': 'Cal_Legs_2030-02-03_tracked.csv', 'csv_content': PLAN_CSV})
+    assert response.status_code == 400
+
+
+def test_completion_with_stale_version_keeps_session(server, coach):
+    filename = 'Cal_Arms_2030-02-04_tracked.csv'
+    save(coach, filename, csv_content=PLAN_CSV, version=0)
+    response = coach.post('/api/complete_workout', json={'plan_filename': 'Cal_Arms_2030-02-04.csv', 'tracked_filename': filename,
+                                                         'csv_content': PLAN_CSV, 'version': 0})
+    assert response.status_code == 409
+    assert server.storage.exists('inprogress', filename) and not server.storage.exists('finished', filename)
+
+
+def test_completion_event_commits_with_the_completion(server, coach):
+    filename = 'Cal_Core_2030-02-05_tracked.csv'
+    version = save(coach, filename, csv_content=PLAN_CSV, version=0).get_json()['version']
+    body = {'plan_filename': 'Cal_Core_2030-02-05.csv', 'tracked_filename': filename, 'csv_content': PLAN_CSV}
+    assert coach.post('/api/complete_workout', json={**body, 'version': version + 1}).status_code == 409
+    assert coach.post('/api/complete_workout', json={**body, 'version': version}).status_code == 200
+    with sqlite3.connect(server.DB_PATH) as conn:
+        kinds = [kind for kind, in conn.execute("SELECT kind FROM session_events WHERE filename = ? ORDER BY id", (filename,))]
+    assert kinds == ['progress', 'completed']
+
+
+def test_completion_interrupted_in_storage_can_be_sent_again(server, coach, monkeypatch):
+    filename = 'Cal_Grip_2030-02-06_tracked.csv'
+    version = save(coach, filename, csv_content=PLAN_CSV, version=0).get_json()['version']
+    version = save(coach, filename, version=version, changes=[{'exercise': 'Back Squat', 'set': '2', 'actual_reps': 4}]).get_json()['version']
+    body = {'plan_filename': 'Cal_Grip_2030-02-06.csv', 'tracked_filename': filename, 'csv_content': PLAN_CSV, 'version': version}
+    remove = server.storage.remove
+
+    def crash(state, name):
+        raise OSError('power cut')
+
+    monkeypatch.setattr(server.storage, 'remove', crash)
+    assert coach.post('/api/complete_workout', json=body).status_code == 500
+    assert server.get_progress_version(filename) == version
+    monkeypatch.setattr(server.storage, 'remove', remove)
+    assert coach.post('/api/complete_workout', json=body).status_code == 200
+    assert server.get_progress_version(filename) == 0
+    assert server.storage.exists('finished', filename) and not server.storage.exists('inprogress', filename)
@@ -0,0 +1,10 @@
+def test_roster_cache_reloads_only_for_roster_changes(server, coach):
+    cached = server.roster.athletes()
+    server.metrics.add('dunamis_emails_total', result='sent')
+    server.metrics.flush()
+    assert server.roster.athletes() is cached
+
+    updated = [*cached, {'name': 'Ivy', 'email': 'ivy@example.com'}]
+    assert coach.post('/api/update_athletes', json=updated).status_code == 200
+    assert 'Ivy' in {a['name'] for a in server.roster.athletes()}
+    assert server.roster.email_for('ivy') == 'ivy@example.com'
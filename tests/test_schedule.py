@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import PLAN_CSV
+
+
+@pytest.fixture
+def template(server, coach):
+    roster = server.roster.athletes()
+    if 'Jo' not in {a['name'] for a in roster}:
+        coach.post('/api/update_athletes', json=[*roster, {'name': 'Jo', 'email': 'jo@example.com'}])
+    csv_content = PLAN_CSV.replace('"1","5","185"', '"1","5","inf"').replace('"2","5","185"', '"2","5","nan"')
+    coach.post('/api/save_plan', json={'filename': 'Jo_Template_2030-05-01.csv', 'csv_content': csv_content})
+    return {'type': 'plan', 'filename': 'Jo_Template_2030-05-01.csv'}
+
+
+def test_non_finite_template_weights_pass_through(server, coach, template):
+    response = coach.post('/api/schedule_mesocycle', json={
+        'template': template, 'athletes': ['Jo'], 'dates': ['2030-05-08', '2030-05-15'], 'workout_name': 'Block',
+        'progression': {'type': 'percent', 'amount': 5, 'round_to': 5}})
+    assert response.status_code == 200
+    plan = server.storage.read('planned', response.get_json()['plans'][-1]['filename'])
+    assert '"Back Squat","1","5","inf"' in plan and '"Back Squat","2","5","nan"' in plan
+
+
+def test_non_finite_progression_is_rejected(coach, template):
+    response = coach.post('/api/schedule_mesocycle', json={
+        'template': template, 'athletes': ['Jo'], 'dates': ['2030-05-08'], 'progression': {'type': 'fixed', 'amount': 'inf'}})
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+"""Worker boot budget: importing server stays light and repeats no one-time seeding work."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from conftest import REPO_DIR
+
+STARTUP_BUDGET_SECONDS = 0.5
+HEAVY_MODULES = ('pandas', 'numpy', 'smtplib', 'email.mime')
+IMPORT_PROBE = f'''
+import json, sys, time
+started = time.perf_counter()
+import server
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+'''
+
+
+def import_server(data_dir):
+    env = {**os.environ, 'DUNAMIS_DATA_DIR': data_dir}
+    result = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, timeout=60, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_worker_import_is_light_and_fast():
+    with tempfile.TemporaryDirectory() as data_dir:
+        import_server(data_dir)  # First boot creates users.db and seeds the coach account.
+        boots = [import_server(data_dir) for _ in range(3)]
+    assert boots[0]['heavy'] == []
+    assert min(boot['seconds'] for boot in boots) < STARTUP_BUDGET_SECONDS
+
+
+def test_init_db_does_not_rehash_existing_coach(server, monkeypatch):
+    def fail(password):
+        raise AssertionError('init_db hashed the coach password again')
+    monkeypatch.setattr(server, 'generate_password_hash', fail)
+    with sqlite3.connect(server.DB_PATH) as conn:
+        conn.execute("PRAGMA user_version = 0")
+    server.init_db()
+    with sqlite3.connect(server.DB_PATH) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == server.SCHEMA_VERSION
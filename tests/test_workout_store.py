@@ -0,0 +1,71 @@
+import os
+import sys
+
+from conftest import PLAN_CSV, REPO_DIR
+
+sys.path.insert(0, os.path.join(REPO_DIR, 'tools'))
+
+
+def test_catalog_sees_file_created_in_same_mtime_tick(server):
+    store = server.FileWorkoutStore()
+    directory = store.STATES['planned'][0]
+    store.write('planned', 'Ada_Push_2030-01-01.csv', PLAN_CSV)
+    assert store.files('planned', 'ada') == ['Ada_Push_2030-01-01.csv']
+    # Another worker adds a file without the directory mtime visibly changing (coarse timestamps).
+    before = os.stat(directory).st_mtime_ns
+    with open(os.path.join(directory, 'Ada_Pull_2030-01-02.csv'), 'w') as f:
+        f.write(PLAN_CSV)
+    os.utime(directory, ns=(before, before))
+    assert store.files('planned', 'ada') == ['Ada_Push_2030-01-01.csv', 'Ada_Pull_2030-01-02.csv']
+
+
+def test_catalog_sees_other_worker_write_after_local_write(server):
+    store, other = server.FileWorkoutStore(), server.FileWorkoutStore()
+    assert store.files('planned', 'bea') == []
+    other.write('planned', 'Bea_Push_2030-01-01.csv', PLAN_CSV)
+    store.write('planned', 'Bea_Pull_2030-01-02.csv', PLAN_CSV)
+    other.remove('planned', 'Bea_Push_2030-01-01.csv')
+    assert store.files('planned', 'bea') == ['Bea_Pull_2030-01-02.csv']
+    assert other.files('planned', 'bea') == ['Bea_Pull_2030-01-02.csv']
+
+
+def test_sqlite_complete_drops_plan_and_in_progress_rows(server, tmp_path):
+    store = server.SqliteWorkoutStore(str(tmp_path / 'workouts.db'))
+    store.write('planned', 'Gus_Push_2030-01-03.csv', PLAN_CSV)
+    store.write('inprogress', 'Gus_Push_2030-01-03_tracked.csv', PLAN_CSV)
+    finished = PLAN_CSV.replace('"",""\n', '"8",""\n')
+    store.complete('Gus_Push_2030-01-03.csv', 'Gus_Push_2030-01-03_tracked.csv', finished)
+    assert store.files('planned', 'gus') == [] and store.files('inprogress', 'gus') == []
+    assert not store.exists('planned', 'Gus_Push_2030-01-03.csv')
+    assert not store.exists('inprogress', 'Gus_Push_2030-01-03_tracked.csv')
+    assert store.files('finished', 'gus') == ['Gus_Push_2030-01-03_tracked.csv']
+    assert store.read('finished', 'Gus_Push_2030-01-03_tracked.csv') == finished
+
+
+def test_migration_round_trip_files_to_sqlite_and_back(server, coach, tmp_path):
+    from migrate_storage import STATES, migrate
+
+    def snapshot(store):
+        return {(state, f): store.read(state, f) for state in STATES for a in store.athletes(state) for f in store.files(state, a)}
+
+    files = server.storage
+    files.write('planned', 'Hal_Push_2030-01-04.csv', PLAN_CSV)
+    files.write('finished', 'Hal_Pull_2030-01-02_tracked.csv', PLAN_CSV)
+    coach.post('/api/save_progress', json={'filename': 'Hal_Legs_2030-01-03_tracked.csv', 'csv_content': PLAN_CSV, 'version': 0})
+    coach.post('/api/save_progress', json={'filename': 'Hal_Legs_2030-01-03_tracked.csv', 'version': 1,
+                                           'changes': [{'exercise': 'Back Squat', 'set': '1', 'actual_reps': 6}]})
+    if files.exercises_signature() is None:
+        files.save_exercises(['Back Squat'])
+
+    sqlite = server.SqliteWorkoutStore(str(tmp_path / 'workouts.db'))
+    counts = migrate(server, files, sqlite)
+    original, exercises = snapshot(files), files.exercises()
+    assert snapshot(sqlite) == original and sqlite.exercises() == exercises
+    assert counts['inprogress'] >= 1 and counts['exercises'] == len(exercises)
+    assert '"Back Squat","1","5","185","None","Brace hard","6"' in original[('inprogress', 'Hal_Legs_2030-01-03_tracked.csv')]
+
+    for state, filename in [('planned', 'Hal_Push_2030-01-04.csv'), ('finished', 'Hal_Pull_2030-01-02_tracked.csv')]:
+        files.remove(state, filename)
+    files.write('inprogress', 'Hal_Legs_2030-01-03_tracked.csv', PLAN_CSV)
+    migrate(server, sqlite, files)
+    assert snapshot(files) == original and files.exercises() == exercises
@@ -0,0 +1,280 @@
+"""Times every /api route through the Flask test client against a generated data directory.
+
+    python tools/generate_data.py /tmp/dunamis_bench --today 2025-09-01
+    python tools/bench_endpoints.py /tmp/dunamis_bench --save before-change
+    python tools/bench_endpoints.py /tmp/dunamis_bench --compare before-change
+
+The data directory is copied to a scratch location first, so routes that write (save_plan,
+complete_workout, ...) start from the same state on every run. Each route reports its first
+(cold-cache) call, p50/p95/p99 over the timed calls and the peak Python heap of one traced call.
+Timings include reading the response body, so streamed routes are measured to their last byte.
+Baselines are JSON files in tools/bench_baselines/.
+"""
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(REPO_DIR, 'tools', 'bench_baselines')
+# A route regresses when its p95 grows by more than this fraction and by more than REGRESSION_MIN_MS.
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_MIN_MS = 1.0
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Fixture:
+    """Names and payloads picked from the data set once, shared by the scenarios."""
+
+    def __init__(self, server, client):
+        self.client = client
+        self.db_path = server.DB_PATH
+        self.athletes = [a['name'] for a in client.get('/api/get_athletes').get_json()['athletes']]
+        busiest = max(self.athletes, key=lambda a: len(server.storage.files('finished', a)))
+        self.athlete = busiest
+        self.finished = server.storage.files('finished', busiest)
+        self.planned = server.storage.files('planned', busiest)
+        self.workout_csv = server.storage.read('finished', self.finished[-1])
+        self.workout_rows = list(csv.DictReader(self.workout_csv.splitlines()))
+        self.plan_exercises = sorted({row['Exercise'] for row in self.workout_rows})
+        self.exercise = self.plan_exercises[0]
+        self.counter = 0
+        self._archive = None
+
+    def archive(self):
+        """The busiest athlete's export, made once and re-imported by the import scenario."""
+        if self._archive is None:
+            self._archive = self.client.get('/api/export', query_string={'athlete': self.athlete}).get_data()
+        return self._archive
+
+    def bench_dates(self, count):
+        """count unused dates in the far future, so no bench write clashes with another."""
+        start = datetime.date(2100, 1, 1) + datetime.timedelta(days=self.counter + 1)
+        self.counter += count
+        return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+    def bench_filename(self, suffix='.csv'):
+        return f"{self.athlete}_Bench_{self.bench_dates(1)[0]}{suffix}"
+
+
+def send(client, call):
+    """Makes one request and reads its body; a call with 'chunks' reads only that many pieces of a stream."""
+    call = dict(call)
+    method, path, chunks = call.pop('method'), call.pop('path'), call.pop('chunks', None)
+    response = client.open(path, method=method, **call)
+    if chunks is None:
+        response.get_data()
+    else:
+        for _ in itertools.islice(response.response, chunks):
+            pass
+    response.close()
+    return response
+
+
+def scenarios(fx):
+    """(name, setup) pairs. setup runs untimed before each call and returns the request to time."""
+    def plain(method, path, **kwargs):
+        return lambda: dict(method=method, path=path, **kwargs)
+
+    def save_progress_setup():
+        return dict(method='POST', path='/api/save_progress',
+                    json={'filename': fx.bench_filename('_tracked.csv'), 'csv_content': fx.workout_csv, 'version': 0})
+
+    def delta_progress_setup():
+        filename = fx.bench_filename('_tracked.csv')
+        version = fx.client.post('/api/save_progress', json={'filename': filename, 'csv_content': fx.workout_csv, 'version': 0}).get_json()['version']
+        row = fx.workout_rows[0]
+        changes = [{'exercise': row['Exercise'], 'set': row['Set'], 'actual_reps': '5', 'actual_weight': '100', 'rir': '2'}]
+        return dict(method='POST', path='/api/save_progress', json={'filename': filename, 'version': version, 'changes': changes})
+
+    def complete_setup():
+        plan = fx.bench_filename()
+        tracked = plan.replace('.csv', '_tracked.csv')
+        fx.client.post('/api/save_plan', json={'filename': plan, 'csv_content': fx.workout_csv})
+        version = fx.client.post('/api/save_progress', json={'filename': tracked, 'csv_content': fx.workout_csv, 'version': 0}).get_json()['version']
+        return dict(method='POST', path='/api/complete_workout',
+                    json={'plan_filename': plan, 'tracked_filename': tracked, 'csv_content': fx.workout_csv, 'version': version})
+
+    def tracked_setup():
+        tracked = fx.bench_filename('_tracked.csv')
+        fx.client.post('/api/save_progress', json={'filename': tracked, 'csv_content': fx.workout_csv, 'version': 0})
+        return dict(method='GET', path='/api/get_workout', query_string={'type': 'tracked', 'filename': tracked})
+
+    def session_events_setup():
+        # A coach's stream reconnecting just as an athlete saves: timed until that save's event
+        # arrives, which includes the wait for the server's next poll of session_events.
+        fx.client.post('/api/save_progress', json={'filename': fx.bench_filename('_tracked.csv'), 'csv_content': fx.workout_csv, 'version': 0})
+        with sqlite3.connect(fx.db_path) as conn:
+            last_id = conn.execute("SELECT MAX(id) FROM session_events").fetchone()[0]
+        return dict(method='GET', path='/api/session_events', query_string={'athlete': fx.athlete},
+                    headers={'Last-Event-ID': str(last_id - 1)}, chunks=2)
+
+    def delete_setup():
+        plan = fx.bench_filename()
+        fx.client.post('/api/save_plan', json={'filename': plan, 'csv_content': fx.workout_csv})
+        return dict(method='POST', path='/api/delete_plan', json={'filename': plan})
+
+    roster = [{'name': a, 'email': f"{a.lower()}@example.com"} for a in fx.athletes]
+    return [
+        ('get_current_user', plain('GET', '/api/get_current_user')),
+        ('get_athletes', plain('GET', '/api/get_athletes')),
+        ('update_athletes (unchanged)', plain('POST', '/api/update_athletes', json=roster)),
+        ('list_workouts_for_tracker', plain('GET', '/api/list_workouts_for_tracker', query_string={'user': fx.athlete})),
+        ('mesocycle_view', plain('GET', '/api/mesocycle_view', query_string={'user': fx.athlete})),
+        ('get_analysis', plain('GET', '/api/get_analysis', query_string={'user': fx.athlete})),
+        ('get_analysis (columnar, one exercise)', plain('GET', '/api/get_analysis', query_string={
+            'user': fx.athlete, 'format': 'columnar', 'exercise': fx.exercise})),
+        ('get_analysis (names only)', plain('GET', '/api/get_analysis', query_string={
+            'user': fx.athlete, 'format': 'columnar', 'names_only': '1'})),
+        ('get_exercise_history', plain('GET', '/api/get_exercise_history', query_string={'user': fx.athlete, 'exercise': fx.exercise})),
+        ('get_exercise_history_batch', plain('POST', '/api/get_exercise_history_batch', json={
+            'user': fx.athlete, 'exercises': fx.plan_exercises})),
+        ('coach_dashboard', plain('GET', '/api/coach_dashboard', query_string={'as_of': fx.finished[-1].split('_')[-2]})),
+        ('save_plan', lambda: dict(method='POST', path='/api/save_plan', json={'filename': fx.bench_filename(), 'csv_content': fx.workout_csv})),
+        ('save_progress (snapshot)', save_progress_setup),
+        ('save_progress (delta)', delta_progress_setup),
+        ('complete_workout', complete_setup),
+        ('get_exercises', plain('GET', '/api/get_exercises')),
+        ('search_exercises', plain('GET', '/api/search_exercises', query_string={'q': fx.exercise.split()[-1][:4]})),
+        ('add_exercise (similar name, rejected)', plain('POST', '/api/add_exercise', json={'exercise': fx.exercise + 's'})),
+        ('get_workout (finished)', plain('GET', '/api/get_workout', query_string={'type': 'finished', 'filename': fx.finished[-1]})),
+        ('get_workout (planned)', plain('GET', '/api/get_workout', query_string={'type': 'plan', 'filename': fx.planned[0]})
+         if fx.planned else None),
+        ('get_workout (tracked)', tracked_setup),
+        ('list_templates', plain('GET', '/api/list_templates', query_string={'user': fx.athlete})),
+        ('delete_plan', delete_setup),
+        ('schedule_mesocycle (12 sessions)', lambda: dict(method='POST', path='/api/schedule_mesocycle', json={
+            'template': {'type': 'finished', 'filename': fx.finished[-1]}, 'athletes': [fx.athlete],
+            'dates': fx.bench_dates(12), 'workout_name': 'Bench', 'progression': {'type': 'percent', 'amount': 2.5, 'round_to': 5}})),
+        ('search_notes (one athlete)', plain('GET', '/api/search_notes', query_string={'q': 'knee', 'athlete': fx.athlete})),
+        ('search_notes (everyone)', plain('GET', '/api/search_notes', query_string={'q': 'knee'})),
+        ('session_events (next event)', session_events_setup),
+        ('metrics', plain('GET', '/api/metrics')),
+        ('export (one athlete, zip)', plain('GET', '/api/export', query_string={'athlete': fx.athlete})),
+        ('export (everyone, tar.gz)', plain('GET', '/api/export', query_string={'format': 'tar.gz'})),
+        ('import (one athlete, zip)', lambda: dict(method='POST', path='/api/import', content_type='multipart/form-data',
+                                                   data={'archive': (io.BytesIO(fx.archive()), 'bench.zip')})),
+    ]
+
+
+def run(data_dir, iterations, only):
+    scratch = tempfile.mkdtemp(prefix='dunamis_bench_')
+    shutil.copytree(data_dir, scratch, dirs_exist_ok=True)
+    os.environ['DUNAMIS_DATA_DIR'] = scratch
+    # Keep the outbox sender from mailing the synthetic roster.
+    os.environ.pop('EMAIL_USER', None)
+    os.environ.pop('EMAIL_PASS', None)
+    sys.path.insert(0, REPO_DIR)
+    try:
+        import server
+        server.app.logger.setLevel('WARNING')
+        client = server.app.test_client()
+        client.post('/login', data={'username': 'coach', 'password': 'get$trong@dunamis'})
+        fx = Fixture(server, client)
+        dataset = {
+            'athletes': len(fx.athletes),
+            'storage': server.STORAGE_BACKEND,
+            'finished_files': sum(len(server.storage.files('finished', a)) for a in server.storage.athletes('finished')),
+            'planned_files': sum(len(server.storage.files('planned', a)) for a in server.storage.athletes('planned')),
+        }
+        results = {}
+        for name, setup in scenarios(fx):
+            if setup is None or (only and only not in name):
+                continue
+            timings = []
+            for _ in range(iterations + 1):
+                call = setup()
+                started = time.perf_counter()
+                response = send(client, call)
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{name}: {call['method']} {call['path']} returned {response.status_code}")
+                timings.append(elapsed)
+            call = setup()
+            tracemalloc.start()
+            send(client, call)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            warm = sorted(timings[1:])
+            results[name] = {
+                'cold_ms': round(timings[0], 2),
+                'p50_ms': round(percentile(warm, 50), 2),
+                'p95_ms': round(percentile(warm, 95), 2),
+                'p99_ms': round(percentile(warm, 99), 2),
+                'peak_kib': round(peak / 1024, 1),
+                'status': response.status_code,
+            }
+            print(format_row(name, results[name]), flush=True)
+        return results, dataset
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def format_row(name, r):
+    return (f"{name:<42} {r['cold_ms']:>9.2f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['peak_kib']:>10.1f} {r['status']:>6}")
+
+
+def compare(results, baseline):
+    regressions = []
+    for name, r in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        if r['p95_ms'] > before['p95_ms'] * (1 + REGRESSION_TOLERANCE) and r['p95_ms'] - before['p95_ms'] > REGRESSION_MIN_MS:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} ms -> {r['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data', help='Data directory made by tools/generate_data.py (left untouched).')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed calls per route after the cold one.')
+    parser.add_argument('--only', help='Only run routes whose name contains this text.')
+    parser.add_argument('--save', metavar='NAME', help='Save the results as tools/bench_baselines/NAME.json.')
+    parser.add_argument('--compare', metavar='NAME', help='Fail if a route regressed against baseline NAME.')
+    args = parser.parse_args(argv)
+    if not os.path.isdir(os.path.join(args.data, 'finished_workouts')):
+        parser.error(f"{args.data} has no finished_workouts/; create it with tools/generate_data.py first.")
+
+    print(f"{'route':<42} {'cold ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'status':>6}")
+    results, dataset = run(args.data, args.iterations, args.only)
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, 'w') as f:
+            json.dump({'created': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                       'machine': platform.machine(), 'iterations': args.iterations, 'dataset': dataset, 'results': results},
+                      f, indent=2)
+        print(f"Saved baseline to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline['dataset'] != dataset:
+            print(f"Warning: baseline data set {baseline['dataset']} differs from this run's {dataset}")
+        regressions = compare(results, baseline)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
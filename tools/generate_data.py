@@ -0,0 +1,161 @@
+"""Fills a data directory with synthetic athletes and workouts in the app's real file formats.
+
+    python tools/generate_data.py /tmp/dunamis_bench --athletes 50 --years 3
+
+writes planned_workouts/, inprogress_workouts/, finished_workouts/, api/exercises.csv and
+api/emails.csv under the target directory. Serve it with DUNAMIS_DATA_DIR=/tmp/dunamis_bench;
+the roster in emails.csv is imported into the new users.db on first start.
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+import sys
+
+WORKOUT_HEADER = ["Exercise", "Set", "Target Reps", "Target Weight (lb)", "Superset Group",
+                  "Coach's Notes", "Actual Reps", "Actual Weight (lb)", "RIR", "Athlete Notes"]
+DAY_TEMPLATES = ['Upper-Heavy', 'Lower-Heavy', 'Upper-Volume', 'Lower-Volume']
+REP_SCHEMES = {'Heavy': ('3-5', 4), 'Volume': ('8-12', 10)}
+EQUIPMENT = ['Barbell', 'Dumbbell', 'Cable', 'Machine', 'Kettlebell', 'Smith Machine', 'Band', 'Landmine']
+MOVEMENTS = {
+    'Upper': ['Bench Press', 'Incline Press', 'Overhead Press', 'Bent Over Row', 'Pullover', 'Curl',
+              'Triceps Extension', 'Lateral Raise', 'Face Pull', 'Shrug', 'Floor Press', 'Seal Row'],
+    'Lower': ['Back Squat', 'Front Squat', 'Deadlift', 'Romanian Deadlift', 'Lunge', 'Split Squat',
+              'Hip Thrust', 'Good Morning', 'Step Up', 'Calf Raise', 'Box Squat', 'Sumo Deadlift'],
+}
+NOTES = ['', '', '', '', 'Felt strong', 'Grip gave out', 'Slow eccentric', 'Left knee a bit sore', 'Paused reps']
+FIRST_NAMES = ['Alex', 'Blake', 'Casey', 'Devon', 'Emery', 'Finley', 'Gray', 'Harper', 'Indy', 'Jordan',
+               'Kai', 'Logan', 'Morgan', 'Noel', 'Oakley', 'Parker', 'Quinn', 'Riley', 'Sage', 'Taylor']
+
+
+def exercise_catalog(count):
+    """Up to `count` names per body half, as 'Equipment Movement'."""
+    by_half = {half: [f"{equipment} {movement}" for movement in movements for equipment in EQUIPMENT]
+               for half, movements in MOVEMENTS.items()}
+    per_half = max(1, count // 2)
+    return {half: names[:per_half] for half, names in by_half.items()}
+
+
+def athlete_names(count):
+    names = []
+    for i in range(count):
+        suffix = '' if i < len(FIRST_NAMES) else str(i // len(FIRST_NAMES) + 1)
+        names.append(FIRST_NAMES[i % len(FIRST_NAMES)] + suffix)
+    return names
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(WORKOUT_HEADER)
+        writer.writerows(rows)
+
+
+def plan_rows(rng, exercises, template, strength, week):
+    """One planned session: 5-6 exercises of 3-5 sets, loads progressing a little each week."""
+    half, style = template.split('-')
+    target_reps, reps_mid = REP_SCHEMES[style]
+    rows = []
+    for exercise in rng.sample(exercises[half], min(len(exercises[half]), rng.randint(5, 6))):
+        base = strength[exercise] * (1 + 0.004 * week) * (0.85 if style == 'Volume' else 1.0)
+        weight = int(round(base / 5) * 5)
+        superset = rng.choice(['None', 'None', 'None', 'A', 'B'])
+        note = rng.choice(['', '', '', 'Brace hard', 'Control the negative'])
+        for set_number in range(1, rng.randint(3, 5) + 1):
+            rows.append([exercise, set_number, target_reps, weight, superset, note, reps_mid])
+    return rows
+
+
+def tracked_rows(rng, planned, completed_fraction=1.0):
+    """Fills the actual columns of a planned session; the last sets stay empty when partly done."""
+    logged_count = int(len(planned) * completed_fraction)
+    rows = []
+    for i, (exercise, set_number, target_reps, weight, superset, note, reps_mid) in enumerate(planned):
+        if i < logged_count:
+            reps = max(1, reps_mid + rng.randint(-2, 2))
+            actual_weight = max(0, weight + rng.choice([-10, -5, 0, 0, 0, 5]))
+            rows.append([exercise, set_number, target_reps, weight, superset, note, reps, actual_weight,
+                         rng.randint(0, 4), rng.choice(NOTES)])
+        else:
+            rows.append([exercise, set_number, target_reps, weight, superset, note, '', '', '', ''])
+    return rows
+
+
+def generate(out, athletes, years, sessions_per_week, exercise_count, planned_per_athlete, inprogress_fraction, seed, today):
+    rng = random.Random(seed)
+    for directory in ('api', 'planned_workouts', 'inprogress_workouts', 'finished_workouts'):
+        os.makedirs(os.path.join(out, directory), exist_ok=True)
+    exercises = exercise_catalog(exercise_count)
+    with open(os.path.join(out, 'api', 'exercises.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Exercise'])
+        writer.writerows([name] for names in exercises.values() for name in names)
+
+    names = athlete_names(athletes)
+    with open(os.path.join(out, 'api', 'emails.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Athlete', 'Email'])
+        writer.writerows([name, f"{name.lower()}@example.com"] for name in names)
+
+    counts = {'planned': 0, 'inprogress': 0, 'finished': 0}
+    start = today - datetime.timedelta(days=int(365 * years))
+    for name in names:
+        strength = {exercise: rng.randint(8, 60) * 5 for half in exercises.values() for exercise in half}
+        day, session = start, 0
+        while day < today:
+            for offset in sorted(rng.sample(range(7), min(7, sessions_per_week))):
+                date = day + datetime.timedelta(days=offset)
+                if date >= today:
+                    break
+                template = DAY_TEMPLATES[session % len(DAY_TEMPLATES)]
+                planned = plan_rows(rng, exercises, template, strength, (date - start).days // 7)
+                write_csv(os.path.join(out, 'finished_workouts', f"{name}_{template}_{date.isoformat()}_tracked.csv"),
+                          tracked_rows(rng, planned))
+                counts['finished'] += 1
+                session += 1
+            day += datetime.timedelta(days=7)
+        week = (today - start).days // 7
+        for i in range(planned_per_athlete):
+            template = DAY_TEMPLATES[(session + i) % len(DAY_TEMPLATES)]
+            date = today + datetime.timedelta(days=i * 7 // max(1, sessions_per_week))
+            filename = f"{name}_{template}_{date.isoformat()}.csv"
+            planned = plan_rows(rng, exercises, template, strength, week)
+            write_csv(os.path.join(out, 'planned_workouts', filename), [row[:6] + ['', '', '', ''] for row in planned])
+            counts['planned'] += 1
+            if i == 0 and rng.random() < inprogress_fraction:
+                write_csv(os.path.join(out, 'inprogress_workouts', filename.replace('.csv', '_tracked.csv')),
+                          tracked_rows(rng, planned, completed_fraction=0.5))
+                counts['inprogress'] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out', help='Data directory to fill; must not already contain workouts unless --force.')
+    parser.add_argument('--athletes', type=int, default=50)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--sessions-per-week', type=int, default=4)
+    parser.add_argument('--exercises', type=int, default=150, help='Size of exercises.csv (split across upper/lower).')
+    parser.add_argument('--planned-per-athlete', type=int, default=6)
+    parser.add_argument('--inprogress-fraction', type=float, default=0.3,
+                        help='Share of athletes with their next session in progress.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--today', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help='Last day of history (YYYY-MM-DD); fix it for reproducible data.')
+    parser.add_argument('--force', action='store_true', help='Write into a directory that already has workouts.')
+    args = parser.parse_args(argv)
+
+    existing = os.path.join(args.out, 'finished_workouts')
+    if os.path.isdir(existing) and os.listdir(existing) and not args.force:
+        parser.error(f"{existing} is not empty; pass --force to add to it.")
+    if os.path.exists(os.path.join(args.out, 'api', 'users.db')):
+        print("Note: api/users.db already exists, so emails.csv will not be re-imported into its roster.", file=sys.stderr)
+    counts = generate(args.out, args.athletes, args.years, args.sessions_per_week, args.exercises,
+                      args.planned_per_athlete, args.inprogress_fraction, args.seed, args.today)
+    print(f"Wrote {counts['finished']} finished, {counts['inprogress']} in-progress and {counts['planned']} planned "
+          f"workouts for {args.athletes} athletes to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
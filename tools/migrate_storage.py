@@ -0,0 +1,65 @@
+"""Copies workouts and the exercise list from one storage backend to the other.
+
+    python tools/migrate_storage.py files sqlite
+    python tools/migrate_storage.py sqlite files --data /tmp/dunamis_bench
+
+Every planned, in-progress and finished workout and the exercise list of the source backend are
+written to the target in one all-or-nothing step, then both are compared. Workouts the target
+already has under the same name are replaced; others are kept. Journaled in-progress saves are
+folded in first. Stop the server before migrating and restart it with DUNAMIS_STORAGE=<target>.
+The roster stays in api/users.db, which both backends share.
+"""
+import argparse
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ('files', 'sqlite')
+STATES = ('planned', 'inprogress', 'finished')
+
+
+def migrate(server, source, target):
+    """Copies everything in source to target and returns {state: count, 'exercises': count}."""
+    for athlete in source.athletes('inprogress'):
+        for filename in source.files('inprogress', athlete):
+            server.compact_progress(filename)
+    workouts = {(state, filename): source.read(state, filename)
+                for state in STATES for athlete in source.athletes(state) for filename in source.files(state, athlete)}
+    exercises = source.exercises() if source.exercises_signature() is not None else None
+    target.replace(workouts, exercises)
+
+    problems = [f"{state}/{filename}" for (state, filename), content in workouts.items()
+                if target.stat(state, filename) is None or target.read(state, filename) != content]
+    if exercises is not None and target.exercises() != exercises:
+        problems.append('exercise list')
+    if problems:
+        raise RuntimeError(f"Target differs from source after migrating: {', '.join(problems[:20])}")
+    counts = {state: sum(1 for s, _ in workouts if s == state) for state in STATES}
+    counts['exercises'] = len(exercises or [])
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', choices=BACKENDS)
+    parser.add_argument('target', choices=BACKENDS)
+    parser.add_argument('--data', help='Data directory (default: DUNAMIS_DATA_DIR or the project directory).')
+    args = parser.parse_args(argv)
+    if args.source == args.target:
+        parser.error('source and target must be different backends.')
+
+    if args.data:
+        os.environ['DUNAMIS_DATA_DIR'] = args.data
+    # The server's own store is the source, so compacting in-progress sessions reads and writes it.
+    os.environ['DUNAMIS_STORAGE'] = args.source
+    sys.path.insert(0, REPO_DIR)
+    import server
+    server.app.logger.setLevel('WARNING')
+    counts = migrate(server, server.storage, server.open_storage(args.target))
+    print(f"Copied {counts['finished']} finished, {counts['inprogress']} in-progress and {counts['planned']} planned "
+          f"workouts and {counts['exercises']} exercises from {args.source} to {args.target} storage in {server.DATA_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())